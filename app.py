@@ -1,14 +1,55 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 import pandas as pd
+from pandas.io.parsers import TextParser
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import calendar
 import re
 import json
 import requests
-from io import BytesIO
 import os
 import logging
+import hashlib
+import threading
+import time
+import tempfile
+import queue
+import unicodedata
+import gzip
+import csv
+import io
+import sys
+import bisect
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: χωρίς κοινόχρηστο mode
+    fcntl = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import orjson
+except ImportError:  # Fallback στο json της standard library
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Μόνο gzip
+    brotli = None
+
+try:
+    import httpx
+except ImportError:  # Async mode: η λήψη από το Drive γίνεται με requests σε thread
+    httpx = None
 
 # Ρύθμιση logging
 logging.basicConfig(level=logging.INFO)
@@ -202,27 +243,14 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
   <script>
     let recognition;
     let isListening = false;
-    let clientsList = [];
 
-    // Φόρτωση λίστας πελατών
-    async function loadClientsList() {
-      try {
-        const response = await fetch('/clients-list');
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        clientsList = await response.json();
-      } catch (error) {
-        console.error('Error loading clients list:', error);
-        const selectElement = document.getElementById('clientSelect');
-        clientsList = [];
-        for (let i = 0; i < selectElement.options.length; i++) {
-          const option = selectElement.options[i];
-          if (option.value && option.value.trim() !== '') {
-            clientsList.push(option.value);
-          }
-        }
+    // Αναζήτηση πελάτη στον server (fuzzy, με ευρετήριο τριγραμμάτων)
+    async function searchClients(text, limit) {
+      const response = await fetch(`/clients/search?q=${encodeURIComponent(text)}&limit=${limit}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
       }
+      return response.json();
     }
 
     // Αρχικοποίηση Speech Recognition
@@ -245,14 +273,21 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
           const spokenText = event.results[0][0].transcript.toLowerCase();
           document.getElementById('voiceStatus').innerText = `📝 Άκουσα: "${spokenText}"`;
           
-          const matchedClient = findBestMatch(spokenText);
-          if (matchedClient) {
-            document.getElementById('clientSelect').value = matchedClient;
-            document.getElementById('voiceStatus').innerText = `✅ Βρέθηκε: ${matchedClient}`;
-            setTimeout(() => fetchClient(), 1000);
-          } else {
-            document.getElementById('voiceStatus').innerText = `❌ Δεν βρέθηκε πελάτης που να ταιριάζει με: "${spokenText}"`;
-          }
+          searchClients(spokenText, 1)
+            .then(matches => {
+              if (matches.length > 0) {
+                const matchedClient = matches[0].name;
+                document.getElementById('clientSelect').value = matchedClient;
+                document.getElementById('voiceStatus').innerText = `✅ Βρέθηκε: ${matchedClient}`;
+                setTimeout(() => fetchClient(), 1000);
+              } else {
+                document.getElementById('voiceStatus').innerText = `❌ Δεν βρέθηκε πελάτης που να ταιριάζει με: "${spokenText}"`;
+              }
+            })
+            .catch(error => {
+              console.error('Error searching clients:', error);
+              document.getElementById('voiceStatus').innerText = '❌ Σφάλμα αναζήτησης πελάτη';
+            });
         };
 
         recognition.onerror = function(event) {
@@ -285,58 +320,7 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
       isListening = false;
     }
 
-    function findBestMatch(spokenText) {
-      let bestMatch = null;
-      let bestScore = 0;
-      for (const client of clientsList) {
-        const score = calculateSimilarity(spokenText, client.toLowerCase());
-        if (score > bestScore && score > 0.3) {
-          bestScore = score;
-          bestMatch = client;
-        }
-      }
-      return bestMatch;
-    }
-
-    function calculateSimilarity(text1, text2) {
-      text1 = normalizeGreekText(text1);
-      text2 = normalizeGreekText(text2);
-
-      if (text2.includes(text1) || text1.includes(text2)) {
-        return 0.8;
-      }
-
-      const words1 = text1.split(/\\s+/);
-      const words2 = text2.split(/\\s+/);
-      
-      let matchingWords = 0;
-      for (const word1 of words1) {
-        if (word1.length > 2) {
-          for (const word2 of words2) {
-            if (word2.includes(word1) || word1.includes(word2)) {
-              matchingWords++;
-              break;
-            }
-          }
-        }
-      }
-      return matchingWords / Math.max(words1.length, words2.length);
-    }
-
-    function normalizeGreekText(text) {
-      return text.toLowerCase()
-        .replace(/ά/g, 'α').replace(/έ/g, 'ε').replace(/ή/g, 'η')
-        .replace(/ί/g, 'ι').replace(/ό/g, 'ο').replace(/ύ/g, 'υ')
-        .replace(/ώ/g, 'ω').replace(/ΐ/g, 'ι').replace(/ΰ/g, 'υ')
-        .replace(/[^\\u0370-\\u03FF\\u1F00-\\u1FFF\\s]/g, '');
-    }
-
     function startVoiceSearch() {
-      if (clientsList.length === 0) {
-        document.getElementById('voiceStatus').innerText = '⏳ Φόρτωση λίστας πελατών...';
-        return;
-      }
-
       if (!recognition) {
         if (!initSpeechRecognition()) {
           return;
@@ -355,8 +339,7 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
       }
     }
 
-    window.onload = async function() {
-      await loadClientsList();
+    window.onload = function() {
       initSpeechRecognition();
     };
 
@@ -452,121 +435,1422 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
 </body>
 </html>'''
 
+# Στήλες του φύλλου που χρησιμοποιεί η εφαρμογή - οι υπόλοιπες δεν μετατρέπονται καθόλου
+USED_COLUMNS = [
+    'Ονομα 1', 'Πληρωτής', 'Μήνας', 'Ετος', 'Μικτό ποσό', 'Υλικό', 'Περιγραφή Υλικού',
+    'Τιμολ.ποσ.', 'τιμή ανα συσκευασία', 'Τρέχον Υπόλοιπο', 'ημερες βαση συμφωνιας', 'Μεταχ'
+]
+
+# Στήλες κειμένου που επαναλαμβάνονται σε κάθε γραμμή τιμολογίου - κρατούνται ως Categorical
+CATEGORICAL_COLUMNS = ['Ονομα 1', 'Υλικό', 'Περιγραφή Υλικού', 'Πληρωτής', 'Μήνας']
+
+# Όρια για cache με κλειδιά από το query string (as_of): τυχαίες ημερομηνίες δεν γεμίζουν τη μνήμη
+MAX_AS_OF_REPORTS = 256
+MAX_QUERY_RESPONSES = 64
+
+# Οι στήλες κειμένου διαβάζονται ως έχουν· οι αριθμητικές μετατρέπονται στο _clean_dataframe
+TEXT_COLUMN_DTYPES = {
+    'Ονομα 1': object,
+    'Πληρωτής': object,
+    'Μήνας': object,
+    'Υλικό': object,
+    'Περιγραφή Υλικού': object
+}
+
+def _openpyxl_rows(path):
+    """Ροή γραμμών με openpyxl σε read-only mode (χωρίς φόρτωση όλου του φύλλου)"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+def _calamine_rows(path):
+    """Γραμμές μέσω calamine (Rust) - πολύ ταχύτερο από το openpyxl"""
+    from python_calamine import CalamineWorkbook
+    workbook = CalamineWorkbook.from_path(path)
+    return workbook.get_sheet_by_index(0).to_python(skip_empty_area=False)
+
+# Αρχή αρχείου .xlsx (zip) και .xls (OLE2)
+EXCEL_MAGIC = (b'PK\x03\x04', b'\xd0\xcf\x11\xe0')
+
+EXCEL_ENGINES = {
+    'calamine': _calamine_rows,
+    'openpyxl': _openpyxl_rows
+}
+
+def _convert_cell(value):
+    # Ίδιες μετατροπές με το pd.read_excel: κενό -> '', ακέραιοι float -> int
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def default_excel_engine():
+    """Το engine από το EXCEL_ENGINE, αλλιώς calamine αν είναι εγκατεστημένο"""
+    engine = os.getenv('EXCEL_ENGINE', 'auto').lower()
+    if engine in EXCEL_ENGINES:
+        return engine
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+def read_workbook(path, engine=None):
+    """
+    Διαβάζει το πρώτο φύλλο κρατώντας μόνο τις USED_COLUMNS.
+    Οι γραμμές περνούν από τον ίδιο parser με το pd.read_excel (ίδια NaN/τύποι),
+    αλλά οι αχρείαστες στήλες πετιούνται πριν από κάθε μετατροπή.
+    """
+    rows = iter(EXCEL_ENGINES[engine or default_excel_engine()](path))
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    
+    header = [str(name).strip() if name is not None else '' for name in header]
+    keep = [i for i, name in enumerate(header) if name in USED_COLUMNS]
+    data = [[header[i] for i in keep]]
+    width = len(header)
+    for row in rows:
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        data.append([_convert_cell(row[i]) for i in keep])
+    
+    # Κενές γραμμές στο τέλος του φύλλου δεν είναι εγγραφές
+    while len(data) > 1 and all(value == '' for value in data[-1]):
+        data.pop()
+    
+    parser = TextParser(data, header=0, skip_blank_lines=False, dtype=TEXT_COLUMN_DTYPES)
+    try:
+        return parser.read()
+    finally:
+        parser.close()
+
+def normalize_greek_text(text):
+    """Πεζά χωρίς τόνους/διαλυτικά (ά->α, ΐ->ι κ.λπ.), μόνο γράμματα/ψηφία και κενά"""
+    text = unicodedata.normalize('NFD', str(text).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).replace('ς', 'σ')
+    return ' '.join(re.sub(r'[^\w\s]|_', ' ', text).split())
+
+def text_similarity(query, name):
+    """Ίδια βαθμολογία με την παλιά αναζήτηση στον browser (κανονικοποιημένα κείμενα)"""
+    if query in name or name in query:
+        return 0.8
+    query_words = query.split()
+    name_words = name.split()
+    if not query_words or not name_words:
+        return 0.0
+    matching_words = 0
+    for query_word in query_words:
+        if len(query_word) > 2 and any(len(name_word) > 2 and (name_word in query_word or query_word in name_word) for name_word in name_words):
+            matching_words += 1
+    return matching_words / max(len(query_words), len(name_words))
+
+class ClientSearchIndex:
+    """Ευρετήριο τριγραμμάτων για fuzzy αναζήτηση ονομάτων πελατών"""
+    
+    MIN_SCORE = 0.3
+    CANDIDATES = 50  # Υποψήφιοι από τα τριγράμματα που βαθμολογούνται αναλυτικά
+    
+    def __init__(self, names):
+        self.names = list(names)
+        self.normalized = [normalize_greek_text(name) for name in self.names]
+        self.trigram_counts = np.zeros(len(self.names), dtype=np.int32)
+        
+        postings = {}
+        for i, text in enumerate(self.normalized):
+            grams = self._trigrams(text)
+            self.trigram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+    
+    @staticmethod
+    def _trigrams(text):
+        # Κενά γύρω από κάθε λέξη ώστε τα προθέματα να μετρούν περισσότερο
+        grams = set()
+        for word in text.split():
+            padded = f'  {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+    
+    def search(self, query, limit=10):
+        """Επιστρέφει [(όνομα, βαθμός)] ταξινομημένα από το καλύτερο"""
+        query = normalize_greek_text(query)
+        grams = self._trigrams(query)
+        if not grams or not self.names:
+            return []
+        
+        # Κοινά τριγράμματα ανά όνομα μόνο για όσα ονόματα μοιράζονται τουλάχιστον ένα
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        dice = 2.0 * shared / (len(grams) + self.trigram_counts)
+        
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > self.CANDIDATES:
+            candidates = candidates[np.argpartition(-dice[candidates], self.CANDIDATES)[:self.CANDIDATES]]
+        
+        scored = []
+        for i in candidates:
+            score = max(float(dice[i]), text_similarity(query, self.normalized[i]))
+            if score > self.MIN_SCORE:
+                scored.append((self.names[i], round(score, 3)))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+class MetricsRegistry:
+    """
+    Counters, gauges και histograms στη μνήμη του process, σε Prometheus text format.
+    Η καταγραφή είναι μια πρόσθεση κάτω από lock· οι gauges που ακριβαίνουν
+    (π.χ. μνήμη DataFrame) υπολογίζονται μόνο όταν ζητηθεί το /metrics.
+    """
+    
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definitions = {}  # όνομα -> (τύπος, περιγραφή, buckets)
+        self._values = {}  # όνομα -> {labels -> τιμή ή [counts ανά bucket, άθροισμα, πλήθος]}
+        self._callbacks = {}  # όνομα gauge -> συνάρτηση που επιστρέφει {labels: τιμή}
+    
+    def counter(self, name, description):
+        self._define(name, 'counter', description)
+    
+    def gauge(self, name, description, callback=None):
+        self._define(name, 'gauge', description)
+        if callback is not None:
+            self._callbacks[name] = callback
+    
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS):
+        self._define(name, 'histogram', description, tuple(buckets))
+    
+    def _define(self, name, kind, description, buckets=None):
+        self._definitions[name] = (kind, description, buckets)
+        self._values.setdefault(name, {})
+    
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+    
+    def observe(self, name, value, **labels):
+        buckets = self._definitions[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            state = self._values[name].get(key)
+            if state is None:
+                state = self._values[name][key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Μετρά τη διάρκεια του block σε δευτερόλεπτα (και όταν πετάξει εξαίρεση)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def render(self):
+        """Όλες οι μετρικές σε Prometheus text exposition format (0.0.4)"""
+        collected = {}
+        for name, callback in self._callbacks.items():
+            try:
+                collected[name] = callback()
+            except Exception as e:
+                logging.warning(f"Metric {name} failed: {e}")
+                collected[name] = {}
+        with self._lock:
+            values = {name: {key: (list(v[0]), v[1], v[2]) if isinstance(v, list) else v for key, v in series.items()}
+                      for name, series in self._values.items()}
+        
+        lines = []
+        for name, (kind, description, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            series = dict(values[name])
+            for labels, value in collected.get(name, {}).items():
+                series[tuple(sorted(labels))] = value
+            for key, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(f"{name}{self._format_labels(key)} {self._format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else self._format_value(bound)
+                    lines.append(f"{name}_bucket{self._format_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(key)} {self._format_value(total)}")
+                lines.append(f"{name}_count{self._format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+    
+    @staticmethod
+    def _format_labels(key):
+        if not key:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+        return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(key, escaped)) + '}'
+    
+    @staticmethod
+    def _format_value(value):
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+metrics = MetricsRegistry()
+metrics.histogram('minicrm_refresh_seconds', 'Συνολική διάρκεια ανανέωσης δεδομένων')
+metrics.histogram('minicrm_refresh_stage_seconds', 'Διάρκεια κάθε σταδίου της ανανέωσης (download, parse, clean, index, persist)')
+metrics.counter('minicrm_refreshes_total', 'Ανανεώσεις δεδομένων ανά αποτέλεσμα')
+metrics.histogram('minicrm_download_seconds', 'Διάρκεια λήψης ανά μέθοδο (api, direct, export) και αποτέλεσμα')
+metrics.histogram('minicrm_snapshot_load_seconds', 'Διάρκεια φόρτωσης του τοπικού snapshot')
+metrics.histogram('minicrm_client_stage_seconds', 'Διάρκεια κάθε σταδίου της /client (lookup, credit_days, pivots, serialize)')
+metrics.counter('minicrm_report_cache_total', 'Αναζητήσεις στην cache αναφορών πελάτη ανά αποτέλεσμα (hit/miss)')
+metrics.histogram('minicrm_http_request_seconds', 'Διάρκεια HTTP αιτημάτων ανά endpoint')
+metrics.counter('minicrm_http_requests_total', 'HTTP αιτήματα ανά endpoint και status')
+metrics.counter('minicrm_singleflight_total', 'Κλήσεις single-flight ανά ομάδα: εκτελέστηκαν (leader) ή περίμεναν άλλη εκτέλεση (coalesced)')
+
+class SingleFlight:
+    """
+    Ταυτόχρονες κλήσεις με το ίδιο κλειδί εκτελούνται μία φορά στο process:
+    η πρώτη υπολογίζει, οι υπόλοιπες περιμένουν και παίρνουν το ίδιο αποτέλεσμα (ή την ίδια εξαίρεση).
+    """
+    
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+        
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def __init__(self, group):
+        self.group = group  # Label των μετρικών
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'leader': 0, 'coalesced': 0}
+    
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            self.stats['leader' if leader else 'coalesced'] += 1
+        metrics.inc('minicrm_singleflight_total', group=self.group, result='leader' if leader else 'coalesced')
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class LRUCache:
+    """Cache με όριο εγγραφών: όταν γεμίσει, φεύγει η εγγραφή που χρησιμοποιήθηκε λιγότερο πρόσφατα"""
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+    
+    def retain(self, keep):
+        """Κρατά μόνο τις εγγραφές για τις οποίες keep(key) είναι αληθές"""
+        with self._lock:
+            for key in [key for key in self._items if not keep(key)]:
+                del self._items[key]
+
+class EncodedResponse:
+    """Σειριοποιημένο σώμα JSON με ETag· οι συμπιεσμένες εκδοχές δημιουργούνται μία φορά"""
+    
+    __slots__ = ('body', 'etag', '_encoded')
+    
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self._encoded = {}
+    
+    def encoded(self, encoding):
+        """Το σώμα στην κωδικοποίηση που δέχεται ο client (None = ασυμπίεστο)"""
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress_body(self.body, encoding)
+        return self._encoded[encoding]
+
+class AggregateCube:
+    """
+    Συγκεντρωτικά ποσά ανά (πελάτη, υλικό, μήνα) με ακέραιους κωδικούς, μία φορά ανά ανανέωση.
+    Κρατά μόνο τα μη κενά κελιά (sparse), ταξινομημένα ανά πελάτη, υλικό και μήνα.
+    Γραμμές με μη αναγνωρίσιμο μήνα δεν μπαίνουν στο cube.
+    """
+    
+    DIMENSIONS = {'client': 'Ονομα 1', 'material': 'Υλικό', 'month': 'Μήνας'}
+    
+    def __init__(self, df):
+        self.clients = pd.Index([], dtype=object)
+        self.materials = pd.Index([], dtype=object)
+        self.periods = np.empty(0, dtype=np.int64)  # year * 12 + month, αύξουσα σειρά
+        self.client = self.material = self.period = np.empty(0, dtype=np.int32)
+        self.amount = self.quantity = np.empty(0, dtype=float)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.client_offsets = np.zeros(1, dtype=np.int64)
+        if df.empty or not {'Ονομα 1', 'Υλικό', 'month'} <= set(df.columns):
+            return
+        
+        client_codes, self.clients = pd.factorize(df['Ονομα 1'], sort=True)
+        material_codes, self.materials = pd.factorize(df['Υλικό'], sort=True)
+        period = df['year'].to_numpy(dtype=np.int64) * 12 + df['month'].to_numpy(dtype=np.int64)
+        valid = (client_codes >= 0) & (material_codes >= 0) & (df['month'].to_numpy() > 0)
+        self.periods = np.unique(period[valid])
+        
+        # Ένας ακέραιος κωδικός ανά κελί· η ταξινόμηση του np.unique δίνει σειρά πελάτη, υλικού, μήνα
+        n_materials, n_periods = len(self.materials), len(self.periods)
+        keys = (client_codes[valid].astype(np.int64) * n_materials + material_codes[valid]) * n_periods
+        keys += np.searchsorted(self.periods, period[valid])
+        cells, inverse = np.unique(keys, return_inverse=True)
+        self.client = (cells // (n_materials * n_periods)).astype(np.int32)
+        self.material = (cells // n_periods % n_materials).astype(np.int32)
+        self.period = (cells % n_periods).astype(np.int32)
+        
+        self.amount = self._sum(df, 'Μικτό ποσό', valid, inverse, len(cells))
+        self.quantity = self._sum(df, 'Τιμολ.ποσ.', valid, inverse, len(cells))
+        self.rows = np.bincount(inverse, minlength=len(cells))
+        # Τα κελιά κάθε πελάτη είναι συνεχόμενα: client_offsets[c]:client_offsets[c + 1]
+        self.client_offsets = np.searchsorted(self.client, np.arange(len(self.clients) + 1))
+    
+    @staticmethod
+    def _sum(df, column, valid, inverse, size):
+        if column not in df.columns:
+            return np.zeros(size)
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)[valid]
+        return np.bincount(inverse, weights=np.nan_to_num(values, nan=0.0), minlength=size)
+    
+    def __len__(self):
+        return len(self.client)
+    
+    def query(self, clients=None, materials=None, start=None, end=None, group_by=()):
+        """
+        Άθροισμα των κελιών που ταιριάζουν στα φίλτρα, ομαδοποιημένο κατά group_by
+        ('client', 'material', 'month'). start/end: περίοδοι year * 12 + month (συμπεριλαμβάνονται).
+        """
+        if clients is not None:
+            # Μόνο τα κελιά των ζητούμενων πελατών, χωρίς σάρωση όλου του cube
+            codes = self.clients.get_indexer(clients)
+            selected = np.concatenate([np.empty(0, dtype=np.int64)] + [
+                np.arange(self.client_offsets[code], self.client_offsets[code + 1]) for code in np.unique(codes[codes >= 0])
+            ])
+        else:
+            selected = np.arange(len(self))
+        
+        mask = np.ones(len(selected), dtype=bool)
+        if materials is not None:
+            mask &= np.isin(self.material[selected], self.materials.get_indexer(materials))
+        if start is not None:
+            mask &= self.period[selected] >= np.searchsorted(self.periods, start)
+        if end is not None:
+            mask &= self.period[selected] < np.searchsorted(self.periods, end, side='right')
+        selected = selected[mask]
+        
+        codes = {
+            'client': self.client[selected],
+            'material': self.material[selected],
+            'month': self.period[selected]
+        }
+        sizes = {'client': len(self.clients), 'material': len(self.materials), 'month': len(self.periods)}
+        keys = np.zeros(len(selected), dtype=np.int64)
+        for dimension in group_by:
+            keys = keys * sizes[dimension] + codes[dimension]
+        if group_by:
+            inverse, groups = pd.factorize(keys, sort=True)  # Hash αντί για ταξινόμηση όλων των κελιών
+        else:
+            groups, inverse = np.zeros(1, dtype=np.int64), keys  # Ένα σύνολο, ακόμη και χωρίς κελιά
+        
+        result = {}
+        remaining = groups
+        for dimension in reversed(group_by):
+            remaining, group_codes = np.divmod(remaining, sizes[dimension])
+            if dimension == 'month':
+                years, months = np.divmod(self.periods[group_codes] - 1, 12)
+                values = [f"{month + 1:02d}/{year}" for year, month in zip(years, months)]
+            else:
+                values = (self.clients if dimension == 'client' else self.materials)[group_codes]
+            result[self.DIMENSIONS[dimension]] = values
+        result = dict(reversed(result.items()))
+        
+        result['Μικτό ποσό'] = np.bincount(inverse, weights=self.amount[selected], minlength=len(groups)).round(2)
+        result['Τιμολ.ποσ.'] = np.bincount(inverse, weights=self.quantity[selected], minlength=len(groups)).round(2)
+        result['Γραμμές'] = np.bincount(inverse, weights=self.rows[selected], minlength=len(groups)).astype(np.int64)
+        return pd.DataFrame(result)
+
+class ClientRankings:
+    """Σύνοψη πίστωσης όλων των πελατών για μία ημέρα, με έτοιμες φθίνουσες σειρές κατάταξης"""
+    
+    METRICS = {'collectible': 'Εισπρακτέο Ποσό', 'excess_days': 'Ημέρες Υπέρβασης', 'balance': 'Τρέχον Υπόλοιπο'}
+    
+    def __init__(self, summary, day):
+        self.day = day
+        self.summary = summary
+        ranked = summary.assign(**{'Ημέρες Υπέρβασης': summary['Ημέρες Πίστωσης'] - summary['Ημέρες Βάση Συμφωνίας']})
+        self.ranked = ranked
+        # Θέσεις πελατών ανά μέτρο· ισοβαθμίες αλφαβητικά, πελάτες χωρίς τιμή εκτός κατάταξης
+        self.orders = {}
+        for metric, column in self.METRICS.items():
+            values = pd.to_numeric(ranked[column], errors='coerce').to_numpy(dtype=float)
+            positions = np.flatnonzero(~np.isnan(values))
+            self.orders[metric] = positions[np.argsort(-values[positions], kind='stable')]
+    
+    def page(self, metric, offset=0, limit=20):
+        """(πλήθος κατατασσόμενων πελατών, εγγραφές της σελίδας) - κόστος ανάλογο της σελίδας"""
+        order = self.orders[metric]
+        page = self.ranked.iloc[order[offset:offset + limit]]
+        records = summary_records(page)
+        for rank, record in enumerate(records, offset + 1):
+            record['Θέση'] = rank
+        return len(order), records
+
+class DataSnapshot:
+    """Στιγμιότυπο δεδομένων μαζί με τις δομές που παράγονται από αυτά.
+    Δεν αλλάζει μετά τη δημιουργία του· η ανανέωση δημιουργεί νέο και το αντικαθιστά."""
+    
+    def __init__(self, df, loaded_at=None, previous=None):
+        self.df = df
+        self.loaded_at = loaded_at
+        self.client_index = self._build_client_index(df)  # Ονομα 1 -> θέσεις γραμμών στο df
+        self.available_months = sort_month_labels(df)  # Ετικέτες Μήνα σε χρονολογική σειρά
+        self.months_version = hashlib.md5('|'.join(map(str, self.available_months)).encode('utf-8')).hexdigest()[:16]
+        
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy() if not df.empty else None
+        self.version = self._compute_data_version(df, row_hashes)  # Hash περιεχομένου των δεδομένων
+        # Hash ανά (πελάτη, μήνα) και ανά πελάτη: η ανανέωση ακυρώνει μόνο ό,τι άλλαξε
+        self.month_digests = self._compute_month_digests(df, row_hashes)
+        self.client_digests = self._compute_client_digests(self.month_digests)
+        self.aggregate_cube = AggregateCube(df)  # Πελάτης × υλικό × μήνας για το /aggregate
+        
+        self.responses = {}  # Έτοιμες απαντήσεις (EncodedResponse) που εξαρτώνται μόνο από τα δεδομένα
+        # Απαντήσεις με κλειδί από το query string (π.χ. as_of του ιστορικού): με όριο
+        self.query_responses = LRUCache(MAX_QUERY_RESPONSES)
+        self._rankings = None  # ClientRankings της τελευταίας ημέρας που ζητήθηκε
+        # Σύνοψη και hashes του προηγούμενου στιγμιότυπου: ξαναϋπολογίζονται μόνο οι πελάτες που άλλαξαν
+        same_columns = previous is not None and list(previous.df.columns) == list(df.columns)
+        self._previous_rankings = previous._rankings if same_columns else None
+        self._previous_digests = previous.client_digests if same_columns else None
+        
+        # Ίδιοι πελάτες με το προηγούμενο στιγμιότυπο: το ευρετήριο αναζήτησης δεν ξαναχτίζεται
+        names = list(self.client_index)
+        if previous is not None and previous.search_index.names == names:
+            self.search_index = previous.search_index
+        else:
+            self.search_index = ClientSearchIndex(names)
+    
+    @staticmethod
+    def _build_client_index(df):
+        """Ευρετήριο θέσεων γραμμών ανά πελάτη, μία φορά ανά ανανέωση"""
+        if df.empty or 'Ονομα 1' not in df.columns:
+            return {}
+        return df.groupby('Ονομα 1', sort=False, observed=True).indices
+    
+    @staticmethod
+    def _compute_data_version(df, row_hashes):
+        """Hash περιεχομένου, ίδιο σε όλους τους workers για τα ίδια δεδομένα"""
+        if row_hashes is None:
+            return None
+        digest = hashlib.md5(row_hashes.tobytes())
+        digest.update('|'.join(map(str, df.columns)).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    @staticmethod
+    def _compute_month_digests(df, row_hashes):
+        """
+        Hash των γραμμών κάθε (πελάτη, μήνα) ως Series με index (Ονομα 1, περίοδος).
+        Μετράει και η σειρά των γραμμών μέσα στον πελάτη (π.χ. τελευταία τιμή υλικού).
+        """
+        if row_hashes is None or 'Ονομα 1' not in df.columns:
+            return pd.Series(dtype=np.uint64, index=pd.MultiIndex.from_arrays([[], []], names=['Ονομα 1', 'period']))
+        codes, names = pd.factorize(df['Ονομα 1'])
+        has_client = codes >= 0
+        if 'month' in df.columns:
+            period = df['year'].to_numpy(dtype=np.int64) * 12 + df['month'].to_numpy(dtype=np.int64)
+        else:
+            period = np.zeros(len(df), dtype=np.int64)
+        
+        # Θέση κάθε γραμμής μέσα στον πελάτη, ανακατεμένη με το hash της γραμμής
+        sequence = pd.Series(codes).groupby(codes).cumcount().to_numpy(dtype=np.uint64)
+        mixed = pd.util.hash_array(row_hashes ^ (sequence * np.uint64(0x9E3779B97F4A7C15)))
+        
+        # Ένας ακέραιος κωδικός ανά (πελάτη, περίοδο): πολύ φθηνότερο από factorize σε MultiIndex
+        period_codes, periods = pd.factorize(period[has_client])
+        group_ids, groups = pd.factorize(codes[has_client].astype(np.int64) * len(periods) + period_codes)
+        sums = np.zeros(len(groups), dtype=np.uint64)
+        np.add.at(sums, group_ids, mixed[has_client])  # Άθροισμα modulo 2^64
+        
+        client_names = np.asarray(names, dtype=object)[groups // len(periods)]
+        index = pd.MultiIndex.from_arrays([client_names, periods[groups % len(periods)]], names=['Ονομα 1', 'period'])
+        return pd.Series(sums, index=index)
+    
+    @staticmethod
+    def _compute_client_digests(month_digests):
+        """Ονομα 1 -> hash όλων των γραμμών του πελάτη (hex)"""
+        if month_digests.empty:
+            return {}
+        names = month_digests.index.get_level_values(0)
+        codes, unique_names = pd.factorize(names)
+        sums = np.zeros(len(unique_names), dtype=np.uint64)
+        np.add.at(sums, codes, month_digests.to_numpy())
+        return {name: format(int(value), '016x') for name, value in zip(unique_names, sums)}
+    
+    def diff(self, previous):
+        """Σύνοψη αλλαγών σε σχέση με προηγούμενο στιγμιότυπο (πελάτες και μήνες πελατών)"""
+        old, new = previous.client_digests, self.client_digests
+        # Μία ευθυγράμμιση στο index του νέου: -1 = νέος μήνας πελάτη
+        positions = previous.month_digests.index.get_indexer(self.month_digests.index)
+        existing = positions >= 0
+        months_added = int((~existing).sum())
+        return {
+            'clients_added': len(new.keys() - old.keys()),
+            'clients_removed': len(old.keys() - new.keys()),
+            'clients_changed': sum(1 for name, digest in new.items() if name in old and old[name] != digest),
+            'client_months_added': months_added,
+            'client_months_removed': len(previous.month_digests) - int(existing.sum()),
+            'client_months_changed': int((previous.month_digests.to_numpy()[positions[existing]] != self.month_digests.to_numpy()[existing]).sum()),
+            'months_changed': self.months_version != previous.months_version
+        }
+    
+    @cached_property
+    def client_names(self):
+        """Ονόματα πελατών σε αλφαβητική σειρά"""
+        return sorted(self.client_index)
+    
+    @cached_property
+    def memory_bytes(self):
+        # Υπολογίζεται μία φορά ανά στιγμιότυπο, όταν ζητηθεί (π.χ. από το /metrics)
+        return int(self.df.memory_usage(deep=True).sum())
+    
+    def rankings(self, today=None):
+        """Σύνοψη και κατάταξη πελατών· υπολογίζεται μία φορά ανά ημέρα (οι ημέρες πίστωσης αλλάζουν με αυτή)"""
+        today = today or datetime.now()
+        rankings = self._rankings
+        if rankings is None or rankings.day != today.date():
+            rankings = self._rankings = ClientRankings(self._credit_summary(today), today.date())
+        return rankings
+    
+    def _credit_summary(self, today):
+        """
+        Σύνοψη πελατών για την ημέρα today. Αν το προηγούμενο στιγμιότυπο την είχε ήδη για την ίδια
+        ημέρα, κρατιούνται οι γραμμές των πελατών με ίδιο hash και υπολογίζονται μόνο οι υπόλοιποι.
+        """
+        previous, previous_digests = self._previous_rankings, self._previous_digests
+        self._previous_rankings = self._previous_digests = None  # Χρησιμοποιούνται μία φορά
+        if previous is None or previous.day != today.date() or not self.client_digests:
+            return calculate_credit_summary(self.df, today)
+        
+        reused = previous.summary.index.intersection(
+            [name for name, digest in self.client_digests.items() if previous_digests.get(name) == digest]
+        )
+        changed = [name for name in self.client_digests if name not in reused]
+        parts = [previous.summary.loc[reused]]
+        if changed:
+            rows = self.df.take(np.concatenate([self.client_index[name] for name in changed]))
+            parts.append(calculate_credit_summary(rows, today))
+        logging.info(f"Client summary: {len(changed)} clients recomputed, {len(reused)} reused")
+        return pd.concat(parts).sort_index()
+    
+    def get_client_rows(self, name):
+        """Επιστρέφει τις γραμμές ενός πελάτη μέσω του ευρετηρίου (χωρίς σάρωση)"""
+        positions = self.client_index.get(name)
+        if positions is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[positions]
+    
+    def iter_clients_rows(self, names):
+        """(όνομα, γραμμές) για πολλούς πελάτες με μία συλλογή γραμμών από το df.
+        Για άγνωστους πελάτες επιστρέφεται κενό DataFrame."""
+        positions = [self.client_index.get(name, np.empty(0, dtype=np.intp)) for name in names]
+        if not positions:
+            return
+        rows = self.df.take(np.concatenate(positions))
+        offsets = np.cumsum([0] + [len(p) for p in positions])
+        for name, start, end in zip(names, offsets[:-1], offsets[1:]):
+            yield name, rows.iloc[start:end]
+
 class GoogleDriveDataLoader:
+    # Βασικά URLs (μπορούν να αλλάξουν για δοκιμές με τοπικό HTTP server)
+    DRIVE_API_URL = 'https://www.googleapis.com/drive/v3/files'
+    DRIVE_DOWNLOAD_URL = 'https://drive.google.com/uc'
+    DOCS_EXPORT_URL = 'https://docs.google.com/spreadsheets/d'
+    
     def __init__(self):
         # Environment variables - χρησιμοποίησε μόνο το File ID χωρίς επιπλέον παραμέτρους
         self.file_id = os.getenv('GOOGLE_DRIVE_FILE_ID', '').split('/')[0].split('?')[0]  # Καθαρισμός
         self.api_key = os.getenv('GOOGLE_DRIVE_API_KEY')
         
-        self.df = None
+        self.snapshot = None
         self.last_loaded = None
         self.cache_duration = 3600  # 1 ώρα
+        self.report_cache = {}  # (όνομα, hash πελάτη, έκδοση μηνών, ημέρα) -> EncodedResponse
+        self.as_of_reports = LRUCache(MAX_AS_OF_REPORTS)  # Το ίδιο για αναφορές με as_of (τυχαίες ημερομηνίες)
+        
+        # Τοπικός φάκελος για το snapshot των καθαρισμένων δεδομένων
+        self.cache_dir = os.getenv('DATA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'minicrm-cache'))
+        
+        # Shared mode: ένας worker ανά host κατεβάζει, οι υπόλοιποι κάνουν memory-map το snapshot
+        self.shared_mode = os.getenv('SHARED_DATA_MODE', '').lower() in ('1', 'true', 'yes')
+        if self.shared_mode and (fcntl is None or pa is None):
+            logging.warning("SHARED_DATA_MODE needs fcntl and pyarrow, falling back to per-worker data")
+            self.shared_mode = False
+        
+        self.excel_engine = default_excel_engine()
+        
+        # Κοινόχρηστο connection pool (keep-alive) για όλες τις λήψεις
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Hedged λήψη: μετά από τόσα δευτερόλεπτα χωρίς απάντηση ξεκινά και η επόμενη μέθοδος
+        self.download_hedge_delay = float(os.getenv('DOWNLOAD_HEDGE_DELAY', '2'))
+        self.download_stats = {}  # μέθοδος -> επιτυχίες/αποτυχίες και μέση διάρκεια
+        
+        # ETag/Last-Modified/md5 της τελευταίας επιτυχούς λήψης για conditional requests
+        self.validators = {}
+        self._pending_validators = {}
+        
+        # Μία λήψη τη φορά ανά process· οι υπόλοιποι σερβίρουν τα τρέχοντα δεδομένα
+        self._refresh_lock = threading.Lock()
+        # Όσοι περιμένουν την ίδια φόρτωση ή την ίδια αναφορά μοιράζονται μία εκτέλεση
+        self.refresh_flight = SingleFlight('refresh')
+        self.report_flight = SingleFlight('report')
+        # Ορίζονται από το AsyncApp στο async mode (event loop και pool για τη δουλειά pandas)
+        self.async_loop = None
+        self.async_pool = None
+        self.refresh_job = {
+            'status': 'idle',
+            'started_at': None,
+            'finished_at': None,
+            'rows': None,
+            'changes': None,
+            'error': None
+        }
         
         logging.info(f"Initialized with File ID: {self.file_id}")
         
-    def download_excel_from_drive(self):
-        """Κατεβάζει το Excel από Google Drive με fallback methods"""
+    def download_excel_from_drive(self, downloaded=None):
+        """Κατεβάζει το Excel από Google Drive με fallback methods.
+        Επιστρέφει None αν το αρχείο δεν έχει αλλάξει από την τελευταία φόρτωση.
+        downloaded: αποτέλεσμα της async λήψης (ή η εξαίρεσή της) αντί για νέα λήψη."""
         if not self.file_id:
             raise Exception("Δεν έχει οριστεί Google Drive File ID")
-            
+        
+        if downloaded is None:
+            downloaded = self._hedged_download()
+        elif isinstance(downloaded, Exception):
+            raise downloaded
+        name, df, self._pending_validators = downloaded
+        if df is None:
+            logging.info(f"Method {name}: file unchanged since last download")
+            return None
+        logging.info(f"Successfully downloaded with method {name}: {len(df)} rows")
+        return df
+    
+    def _download_methods(self):
+        """Οι μέθοδοι λήψης, ταχύτερη πρώτη με βάση τις προηγούμενες λήψεις"""
         methods = [
-            self._download_with_api,
-            self._download_direct_public,
-            self._download_alternative_public
+            ('api', self._download_with_api),
+            ('direct', self._download_direct_public),
+            ('export', self._download_alternative_public)
         ]
         
-        for i, method in enumerate(methods, 1):
+        def rank(item):
+            stats = self.download_stats.get(item[0], {})
+            # Πρώτα όσες δεν απέτυχαν την τελευταία φορά, μετά η ταχύτερη, μετά η προεπιλεγμένη σειρά
+            return (stats.get('consecutive_failures', 0) > 0, stats.get('avg_seconds', float('inf')))
+        
+        return sorted(methods, key=rank)
+    
+    def _hedged_download(self):
+        """
+        Hedged λήψη: ξεκινά η ταχύτερη μέθοδος και, αν δεν τελειώσει σε
+        download_hedge_delay δευτερόλεπτα ή αποτύχει, ξεκινά και η επόμενη παράλληλα.
+        Κερδίζει το πρώτο έγκυρο αποτέλεσμα και οι υπόλοιπες ακυρώνονται. Κάθε μέθοδος
+        διαβάζει η ίδια το αρχείο, οπότε μια απάντηση που δεν είναι Excel (π.χ. σελίδα HTML
+        του Drive) μετρά ως αποτυχία και δοκιμάζεται η επόμενη μέθοδος.
+        Επιστρέφει (μέθοδος, DataFrame ή None, validators).
+        """
+        methods = self._download_methods()
+        results = queue.Queue()
+        cancel = threading.Event()
+        
+        def run(name, method):
+            pending = {}
+            start = time.perf_counter()
             try:
-                logging.info(f"Trying download method {i}...")
-                df = method()
-                logging.info(f"Successfully downloaded with method {i}: {len(df)} rows")
-                return df
+                results.put((name, True, method(pending, cancel), pending, time.perf_counter() - start))
             except Exception as e:
-                logging.warning(f"Method {i} failed: {e}")
-                if i == len(methods):
-                    raise Exception(f"Όλες οι μέθοδοι κατεβάσματος απέτυχαν. Τελευταίο σφάλμα: {e}")
+                results.put((name, False, e, pending, time.perf_counter() - start))
+        
+        started = finished = 0
+        launch_next = True
+        last_error = None
+        while finished < len(methods):
+            if launch_next and started < len(methods):
+                name, method = methods[started]
+                logging.info(f"Trying download method {name}...")
+                threading.Thread(target=run, args=(name, method), name=f'download-{name}', daemon=True).start()
+                started += 1
+            launch_next = False
+            try:
+                timeout = self.download_hedge_delay if started < len(methods) else None
+                name, ok, value, pending, elapsed = results.get(timeout=timeout)
+            except queue.Empty:
+                launch_next = True  # Αργεί: ξεκινά και η επόμενη μέθοδος παράλληλα
                 continue
+            finished += 1
+            self._record_download(name, ok, elapsed)
+            if ok:
+                cancel.set()  # Όσες μέθοδοι τρέχουν ακόμα σταματούν στο επόμενο chunk και διαγράφουν το αρχείο τους
+                return name, value, pending
+            last_error = value
+            launch_next = True
+            logging.warning(f"Method {name} failed: {value}")
+        
+        raise Exception(f"Όλες οι μέθοδοι κατεβάσματος απέτυχαν. Τελευταίο σφάλμα: {last_error}")
+    
+    def _record_download(self, name, ok, elapsed):
+        """Στατιστικά καθυστέρησης ανά μέθοδο (κινητός μέσος όρος) για τη σειρά των επόμενων λήψεων"""
+        stats = self.download_stats.setdefault(name, {'successes': 0, 'failures': 0, 'consecutive_failures': 0})
+        stats['last_seconds'] = round(elapsed, 3)
+        if ok:
+            stats['successes'] += 1
+            stats['consecutive_failures'] = 0
+            previous = stats.get('avg_seconds')
+            stats['avg_seconds'] = round(elapsed if previous is None else 0.7 * previous + 0.3 * elapsed, 3)
+        else:
+            stats['failures'] += 1
+            stats['consecutive_failures'] += 1
+        metrics.observe('minicrm_download_seconds', elapsed, method=name, result='success' if ok else 'failure')
     
-    def _download_with_api(self):
-        """Μέθοδος με API Key"""
+    def _download_with_api(self, pending, cancel):
+        """Μέθοδος με API Key - ελέγχει πρώτα τα metadata του αρχείου"""
         if not self.api_key:
             raise Exception("No API key provided")
             
-        url = f"https://www.googleapis.com/drive/v3/files/{self.file_id}"
-        params = {'alt': 'media', 'key': self.api_key}
+        url = f"{self.DRIVE_API_URL}/{self.file_id}"
         
-        response = requests.get(url, params=params, timeout=30)
+        # Φθηνό αίτημα metadata: αν md5/modifiedTime δεν άλλαξαν, δεν κατεβάζουμε τίποτα
+        response = self.session.get(url, params={'fields': 'md5Checksum,modifiedTime', 'key': self.api_key}, timeout=30)
         response.raise_for_status()
+        if self._metadata_unchanged(response.json(), pending):
+            return None
         
-        excel_data = BytesIO(response.content)
-        return pd.read_excel(excel_data)
+        return self._conditional_get('api', url, pending, cancel, params={'alt': 'media', 'key': self.api_key})
+    
+    def _metadata_unchanged(self, metadata, pending):
+        """Αν md5/modifiedTime του Drive δείχνουν ότι έχουμε ήδη το αρχείο"""
+        known = self._known_validators()
+        if known.get('md5') and known['md5'] == metadata.get('md5Checksum'):
+            return True
+        if known.get('modified_time') and known['modified_time'] == metadata.get('modifiedTime'):
+            return True
+        pending['modified_time'] = metadata.get('modifiedTime')
+        return False
     
-    def _download_direct_public(self):
+    def _download_direct_public(self, pending, cancel):
         """Direct download για public αρχεία"""
-        url = f"https://drive.google.com/uc?id={self.file_id}&export=download"
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        excel_data = BytesIO(response.content)
-        return pd.read_excel(excel_data)
+        url = f"{self.DRIVE_DOWNLOAD_URL}?id={self.file_id}&export=download"
+        return self._conditional_get('direct', url, pending, cancel)
     
-    def _download_alternative_public(self):
+    def _download_alternative_public(self, pending, cancel):
         """Εναλλακτική μέθοδος για public αρχεία"""
-        url = f"https://docs.google.com/spreadsheets/d/{self.file_id}/export?format=xlsx"
-        response = requests.get(url, timeout=30)
+        url = f"{self.DOCS_EXPORT_URL}/{self.file_id}/export?format=xlsx"
+        return self._conditional_get('export', url, pending, cancel)
+    
+    def _conditional_get(self, key, url, pending, cancel, params=None):
+        """
+        GET με If-None-Match / If-Modified-Since από την τελευταία επιτυχή λήψη.
+        Το αρχείο γράφεται σταδιακά σε προσωρινό αρχείο (όχι ολόκληρο στη μνήμη) και διαβάζεται.
+        Επιστρέφει το DataFrame, ή None αν ο server απάντησε 304
+        ή το περιεχόμενο έχει το ίδιο md5 με αυτό που έχουμε ήδη φορτώσει.
+        Σταματά στο επόμενο chunk αν οριστεί το cancel (κέρδισε άλλη μέθοδος).
+        """
+        known = self._known_validators()
+        headers = self._validator_headers(known, key)
+        
+        with self.session.get(url, params=params, headers=headers, timeout=30, stream=True) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            
+            digest = hashlib.md5()
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='download'), \
+                    tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as f:
+                try:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if cancel.is_set():
+                            raise Exception("Download cancelled")
+                        digest.update(chunk)
+                        f.write(chunk)
+                except Exception:
+                    f.close()
+                    os.remove(f.name)
+                    raise
+        
+        path = self._finish_download(key, known, digest.hexdigest(), response.headers, f.name, pending)
+        return self._read_downloaded(path)
+    
+    @staticmethod
+    def _validator_headers(known, key):
+        headers = {}
+        if known.get(f'{key}_etag'):
+            headers['If-None-Match'] = known[f'{key}_etag']
+        if known.get(f'{key}_last_modified'):
+            headers['If-Modified-Since'] = known[f'{key}_last_modified']
+        return headers
+    
+    @staticmethod
+    def _finish_download(key, known, md5, headers, path, pending):
+        """
+        Validators της λήψης· None (και διαγραφή) αν το περιεχόμενο είναι ίδιο με το φορτωμένο.
+        Εξαίρεση αν η απάντηση δεν είναι αρχείο Excel (π.χ. σελίδα επιβεβαίωσης HTML με status 200).
+        """
+        pending.update({
+            'md5': md5,
+            f'{key}_etag': headers.get('ETag'),
+            f'{key}_last_modified': headers.get('Last-Modified')
+        })
+        if known.get('md5') == md5:
+            os.remove(path)
+            return None
+        content_type = headers.get('Content-Type') or ''
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+        if content_type.startswith('text/html') or magic not in EXCEL_MAGIC:
+            os.remove(path)
+            raise Exception(f"Response is not an Excel workbook (Content-Type: {content_type or '-'})")
+        return path
+    
+    async def _async_hedged_download(self):
+        """
+        Όπως το _hedged_download, με tasks στο event loop και httpx αντί για threads και requests:
+        η αναμονή του Drive δεν κρατά κανένα thread.
+        """
+        methods = {
+            'api': self._async_download_with_api,
+            'direct': lambda client, pending: self._async_conditional_get(
+                client, 'direct', f"{self.DRIVE_DOWNLOAD_URL}?id={self.file_id}&export=download", pending),
+            'export': lambda client, pending: self._async_conditional_get(
+                client, 'export', f"{self.DOCS_EXPORT_URL}/{self.file_id}/export?format=xlsx", pending)
+        }
+        remaining = [name for name, _ in self._download_methods()]
+        running = {}  # task -> (μέθοδος, validators, έναρξη)
+        last_error = None
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            launch_next = True
+            while remaining or running:
+                if launch_next and remaining:
+                    name = remaining.pop(0)
+                    logging.info(f"Trying download method {name}...")
+                    pending = {}
+                    running[asyncio.ensure_future(methods[name](client, pending))] = (name, pending, time.perf_counter())
+                launch_next = False
+                done, _ = await asyncio.wait(running, timeout=self.download_hedge_delay if remaining else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch_next = True  # Αργεί: ξεκινά και η επόμενη μέθοδος παράλληλα
+                    continue
+                for task in done:
+                    name, pending, start = running.pop(task)
+                    error = task.exception()
+                    self._record_download(name, error is None, time.perf_counter() - start)
+                    if error is None:
+                        # Οι υπόλοιπες ακυρώνονται και διαγράφουν τα αρχεία τους
+                        others = list(running)
+                        for other in others:
+                            other.cancel()
+                        await asyncio.gather(*others, return_exceptions=True)
+                        return name, task.result(), pending
+                    last_error = error
+                    launch_next = True
+                    logging.warning(f"Method {name} failed: {error}")
+        
+        raise Exception(f"Όλες οι μέθοδοι κατεβάσματος απέτυχαν. Τελευταίο σφάλμα: {last_error}")
+    
+    async def _async_download_with_api(self, client, pending):
+        if not self.api_key:
+            raise Exception("No API key provided")
+        url = f"{self.DRIVE_API_URL}/{self.file_id}"
+        response = await client.get(url, params={'fields': 'md5Checksum,modifiedTime', 'key': self.api_key})
         response.raise_for_status()
+        if self._metadata_unchanged(response.json(), pending):
+            return None
+        return await self._async_conditional_get(client, 'api', url, pending, params={'alt': 'media', 'key': self.api_key})
+    
+    async def _async_conditional_get(self, client, key, url, pending, params=None):
+        """Το _conditional_get με httpx (επιστρέφει DataFrame ή None)· η ακύρωση του task σταματά τη λήψη"""
+        known = self._known_validators()
+        async with client.stream('GET', url, params=params, headers=self._validator_headers(known, key)) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            
+            digest = hashlib.md5()
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='download'), \
+                    tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as f:
+                try:
+                    async for chunk in response.aiter_bytes(64 * 1024):
+                        digest.update(chunk)
+                        f.write(chunk)
+                except BaseException:
+                    f.close()
+                    os.remove(f.name)
+                    raise
         
-        excel_data = BytesIO(response.content)
-        return pd.read_excel(excel_data)
+        path = self._finish_download(key, known, digest.hexdigest(), response.headers, f.name, pending)
+        if path is None:
+            return None
+        # Ανάγνωση στο pool, εκτός event loop· αποτυχία εδώ σημαίνει αποτυχία της μεθόδου
+        return await asyncio.get_running_loop().run_in_executor(self.async_pool, self._read_downloaded, path)
+    
+    def _read_downloaded(self, path):
+        """Ανάγνωση και διαγραφή του προσωρινού αρχείου λήψης"""
+        if path is None:
+            return None
+        try:
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='parse'):
+                return read_workbook(path, self.excel_engine)
+        finally:
+            os.remove(path)
+    
+    def _known_validators(self):
+        # Χωρίς φορτωμένα δεδομένα δεν έχει νόημα το "δεν άλλαξε"
+        if self.snapshot is None or self.snapshot.df.empty:
+            return {}
+        return self.validators
+    
+    @property
+    def df(self):
+        return self.snapshot.df if self.snapshot is not None else None
     
     def get_dataframe(self, force_refresh=False):
         """Επιστρέφει το DataFrame με caching"""
-        import time
+        return self.get_snapshot(force_refresh).df
+    
+    def get_snapshot(self, force_refresh=False):
+        """
+        Επιστρέφει το τρέχον στιγμιότυπο δεδομένων (stale-while-revalidate).
+        Μόνο η πρώτη φόρτωση (ή force_refresh) περιμένει τη λήψη· όταν λήξει
+        η cache, η ανανέωση γίνεται στο παρασκήνιο και σερβίρονται τα παλιά δεδομένα.
+        """
+        if self.snapshot is None and not force_refresh:
+            self.ensure_disk_snapshot()
         
-        current_time = time.time()
+        if force_refresh or self.last_loaded is None:
+            if self.async_loop is not None and self.snapshot is not None:
+                # Async mode: η πρώτη φόρτωση έγινε ήδη στο event loop· δεν κρατάμε thread του pool
+                self.start_background_refresh(force_refresh)
+            else:
+                # Ταυτόχρονα force_refresh κάνουν μία λήψη, όχι μία ο καθένας στη σειρά
+                self.refresh_flight.do('refresh', lambda: self._blocking_refresh(force_refresh))
+        elif (time.time() - self.last_loaded) > self.cache_duration:
+            self.start_background_refresh()
         
-        should_refresh = (
-            force_refresh or 
-            self.df is None or 
-            self.last_loaded is None or 
-            (current_time - self.last_loaded) > self.cache_duration
-        )
+        return self.snapshot
+    
+    def ensure_disk_snapshot(self):
+        # Νέος worker ή επανεκκίνηση: πρώτα το τοπικό snapshot, χωρίς λήψη από το Drive
+        with self._refresh_lock:
+            if self.snapshot is None:
+                self._load_disk_snapshot()
+    
+    def _blocking_refresh(self, force):
+        with self._refresh_lock:
+            # Μπορεί να φόρτωσε άλλο thread όσο περιμέναμε το lock
+            if force or self.last_loaded is None:
+                self.refresh(force=force)
+    
+    def start_background_refresh(self, force=False):
+        """Ξεκινά ανανέωση στο παρασκήνιο, εκτός αν τρέχει ήδη. Επιστρέφει αν ξεκίνησε."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        if self.async_loop is not None:
+            # Async mode: η λήψη γίνεται στο event loop, η επεξεργασία στο pool
+            asyncio.run_coroutine_threadsafe(self.async_refresh_locked(force), self.async_loop)
+            return True
         
-        if should_refresh:
-            logging.info("Refreshing data from Google Drive...")
+        def run():
             try:
-                self.df = self.download_excel_from_drive()
-                self.last_loaded = current_time
-                self._clean_dataframe()
-                
+                self.refresh(force=force)
+            finally:
+                self._refresh_lock.release()
+        
+        threading.Thread(target=run, name='data-refresh', daemon=True).start()
+        return True
+    
+    async def async_refresh_locked(self, force=False):
+        """
+        Ανανέωση για το async mode, με το _refresh_lock ήδη κλειδωμένο (το απελευθερώνει).
+        Η λήψη γίνεται με httpx στο event loop και η επεξεργασία (pandas) στο async_pool.
+        Χωρίς httpx, ή σε shared mode (file lock), η sync ανανέωση τρέχει σε δικό της thread.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if httpx is None or self.shared_mode:
+                await loop.run_in_executor(None, self.refresh, force)
+                return
+            try:
+                downloaded = await self._async_hedged_download() if self.file_id else None
             except Exception as e:
-                logging.error(f"Failed to refresh data: {e}")
-                if self.df is None:
-                    self.df = pd.DataFrame()
+                downloaded = e
+            await loop.run_in_executor(self.async_pool, self._refresh_from_drive, downloaded)
+        finally:
+            self._refresh_lock.release()
+    
+    def refresh(self, force=False):
+        """Ανανέωση των δεδομένων· σε shared mode συντονίζεται με τους άλλους workers"""
+        if self.shared_mode:
+            self._refresh_shared(force)
+        else:
+            self._refresh_from_drive()
+    
+    def _refresh_shared(self, force):
+        """
+        Ένας worker ανά host κάνει τη λήψη (file lock)· όσοι περιμένουν στο lock
+        βρίσκουν μετά φρέσκο snapshot στον δίσκο και απλώς το κάνουν memory-map.
+        """
+        try:
+            self._ensure_cache_dir()
+            lock_file = open(os.path.join(self.cache_dir, 'refresh.lock'), 'w')
+        except OSError as e:
+            logging.warning(f"Shared refresh lock unavailable ({e}), refreshing locally")
+            self._refresh_from_drive()
+            return
         
-        return self.df
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not force and self._load_disk_snapshot(max_age=self.cache_duration):
+                    return
+                self._refresh_from_drive()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _refresh_from_drive(self, downloaded=None):
+        """Λήψη και επεξεργασία νέων δεδομένων και ατομική αντικατάσταση του στιγμιότυπου.
+        downloaded: έτοιμη λήψη από το async mode (βλ. download_excel_from_drive)."""
+        logging.info("Refreshing data from Google Drive...")
+        self.refresh_job.update(status='running', started_at=time.time(), finished_at=None, error=None)
+        start = time.perf_counter()
+        try:
+            df = self.download_excel_from_drive(downloaded)
+            if df is None:
+                # Το αρχείο δεν άλλαξε: κρατάμε το στιγμιότυπο και ξαναμετράμε τη διάρκεια cache
+                self.last_loaded = time.time()
+                self.validators.update(self._pending_validators)
+                self._retain_reports(self.snapshot)  # Οι αναφορές προηγούμενων ημερών δεν χρειάζονται πια
+                self._write_disk_metadata()
+                self.refresh_job.update(status='not_modified', finished_at=time.time(), rows=len(self.snapshot.df))
+                metrics.inc('minicrm_refreshes_total', result='not_modified')
+                return
+            
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='clean'):
+                df = self._clean_dataframe(df)
+            previous = self.snapshot
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='index'):
+                snapshot = DataSnapshot(df, time.time(), previous)
+            changes = snapshot.diff(previous) if previous is not None and not previous.df.empty else None
+            if changes:
+                logging.info(f"Data changes: {changes}")
+            
+            # Οι αναγνώστες κρατούν το παλιό στιγμιότυπο μέχρι να τελειώσουν
+            self.snapshot = snapshot
+            self.last_loaded = snapshot.loaded_at
+            self.validators = self._pending_validators
+            self._retain_reports(snapshot)
+            self._warm_rankings(snapshot)
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='persist'):
+                self._write_disk_snapshot()
+            self.refresh_job.update(status='success', finished_at=time.time(), rows=len(df), changes=changes)
+            metrics.inc('minicrm_refreshes_total', result='success')
+            
+        except Exception as e:
+            logging.error(f"Failed to refresh data: {e}")
+            self.refresh_job.update(status='failed', finished_at=time.time(), error=str(e))
+            metrics.inc('minicrm_refreshes_total', result='failed')
+            if self.snapshot is None:
+                self.snapshot = DataSnapshot(pd.DataFrame())
+        finally:
+            metrics.observe('minicrm_refresh_seconds', time.perf_counter() - start)
     
-    def _clean_dataframe(self):
+    @staticmethod
+    def _warm_rankings(snapshot):
+        """Έτοιμη σύνοψη πελατών για τα πρώτα αιτήματα· μια αποτυχία εδώ δεν ακυρώνει την ανανέωση"""
+        try:
+            with metrics.timer('minicrm_refresh_stage_seconds', stage='rankings'):
+                snapshot.rankings()
+        except Exception as e:
+            logging.warning(f"Could not precompute client rankings: {e}")
+    
+    def _ensure_cache_dir(self, create=True):
+        """
+        Ο φάκελος του snapshot πρέπει να ανήκει στον τρέχοντα χρήστη και να μη γράφεται
+        από άλλους· αλλιώς οποιοσδήποτε τοπικός χρήστης θα μπορούσε να μας δώσει δεδομένα.
+        """
+        if create:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(self.cache_dir)
+        if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+            raise PermissionError(f"Cache directory {self.cache_dir} is not private to this user")
+    
+    def _snapshot_paths(self):
+        return (
+            os.path.join(self.cache_dir, 'snapshot.json'),
+            os.path.join(self.cache_dir, 'snapshot.feather')
+        )
+    
+    def _load_disk_snapshot(self, max_age=None):
+        """
+        Φόρτωση του καθαρισμένου snapshot από τον τοπικό δίσκο. Επιστρέφει αν φορτώθηκε.
+        Με max_age φορτώνεται μόνο αν ελέγχθηκε απέναντι στο Drive πριν από λιγότερα δευτερόλεπτα.
+        """
+        meta_path, feather_path = self._snapshot_paths()
+        try:
+            self._ensure_cache_dir(create=False)
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('file_id') != self.file_id:
+                return False
+            if max_age is not None and time.time() - meta['checked_at'] > max_age:
+                return False
+            
+            # Ίδια δεδομένα με αυτά που ήδη έχουμε: ανανεώνεται μόνο ο χρόνος ελέγχου
+            if self.snapshot is not None and self.snapshot.loaded_at == meta['loaded_at']:
+                self.last_loaded = meta['checked_at']
+                self.validators = meta.get('validators', {})
+                return True
+            
+            start = time.perf_counter()
+            if meta['format'] == 'arrow':
+                df = self._map_arrow_file(feather_path)
+            elif meta['format'] == 'feather':
+                df = pd.read_feather(feather_path)
+            else:
+                # Παλιά snapshots σε pickle δεν φορτώνονται ποτέ (εκτέλεση κώδικα κατά το unpickling)
+                return False
+            
+            # Το Arrow επιστρέφει None για κενές τιμές κειμένου, τα υπόλοιπα περιμένουν NaN
+            text_cols = df.select_dtypes(include='object').columns
+            df[text_cols] = df[text_cols].where(df[text_cols].notna(), np.nan)
+            
+            self.snapshot = DataSnapshot(df, meta['loaded_at'], self.snapshot)
+            metrics.observe('minicrm_snapshot_load_seconds', time.perf_counter() - start, format=meta['format'])
+            self.last_loaded = meta['checked_at']
+            self.validators = meta.get('validators', {})
+            self._retain_reports(self.snapshot)
+            logging.info(f"Loaded local snapshot: {len(df)} rows, checked {time.time() - self.last_loaded:.0f}s ago")
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.warning(f"Could not load local snapshot: {e}")
+            return False
+    
+    def _write_disk_snapshot(self):
+        """Αποθήκευση του καθαρισμένου DataFrame σε columnar μορφή (Feather) για γρήγορη εκκίνηση"""
+        meta_path, feather_path = self._snapshot_paths()
+        try:
+            self._ensure_cache_dir()
+            df = self.snapshot.df
+            if self.shared_mode:
+                # Ασυμπίεστο Arrow IPC ώστε οι workers να το κάνουν memory-map χωρίς αντιγραφή
+                self._atomic_write(feather_path, lambda path: df.to_feather(path, compression='uncompressed'))
+                data_format = 'arrow'
+            else:
+                self._atomic_write(feather_path, lambda path: df.to_feather(path))
+                data_format = 'feather'
+            self._write_disk_metadata(data_format)
+        except Exception as e:
+            logging.warning(f"Could not write local snapshot: {e}")
+    
+    @staticmethod
+    def _map_arrow_file(path):
+        """
+        Memory-map (read-only) ενός ασυμπίεστου Arrow αρχείου. Οι αριθμητικές στήλες
+        χωρίς κενά μένουν στις σελίδες του αρχείου, κοινές για όλους τους workers.
+        """
+        source = pa.memory_map(path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(split_blocks=True)
+    
+    def _write_disk_metadata(self, data_format=None):
+        meta_path = self._snapshot_paths()[0]
+        try:
+            if data_format is None:
+                with open(meta_path, encoding='utf-8') as f:
+                    data_format = json.load(f)['format']
+            meta = {
+                'file_id': self.file_id,
+                'format': data_format,
+                'loaded_at': self.snapshot.loaded_at,
+                'checked_at': self.last_loaded,
+                'validators': self.validators
+            }
+            self._atomic_write(meta_path, lambda path: self._write_json(path, meta))
+        except Exception as e:
+            logging.warning(f"Could not write local snapshot metadata: {e}")
+    
+    @staticmethod
+    def _write_json(path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    
+    @staticmethod
+    def _atomic_write(path, write):
+        # Γράψιμο σε προσωρινό αρχείο και rename, ώστε οι άλλοι workers να μη δουν μισό αρχείο
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _clean_dataframe(self, df):
         """Καθαρισμός και προετοιμασία των δεδομένων"""
-        if self.df is not None and not self.df.empty:
-            self.df.columns = self.df.columns.str.strip()
+        if df is not None and not df.empty:
+            df.columns = df.columns.str.strip()
             
             # Μετατροπή τιμών σε αριθμούς
             numeric_cols = ['Μικτό ποσό', 'ημερες βαση συμφωνιας', 'Μεταχ']
             for col in numeric_cols:
-                if col in self.df.columns:
-                    self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            
+            # Ειδική μεταχείριση για Τρέχον Υπόλοιπο: δεκαδική υποδιαστολή μόνο στις τιμές κειμένου
+            if 'Τρέχον Υπόλοιπο' in df.columns:
+                balance = df['Τρέχον Υπόλοιπο']
+                if balance.dtype == object:
+                    is_text = balance.map(type) == str
+                    balance = balance.where(~is_text, balance[is_text].str.replace(',', '.', regex=False))
+                df['Τρέχον Υπόλοιπο'] = pd.to_numeric(balance, errors='coerce')
+            
+            # Ανάλυση Μήνα/Ετους μία φορά ανά ανανέωση (0 = μη αναγνωρίσιμος μήνας)
+            if 'Μήνας' in df.columns:
+                year, month = parse_month_columns(df['Μήνας'], df.get('Ετος'))
+                df['year'] = year.astype(np.int16)
+                df['month'] = month.astype(np.int8)
+            
+            # Στήλες με αριθμούς και κείμενο μαζί (π.χ. Υλικό 12345 και 'Α-12') γίνονται μόνο κείμενο,
+            # ώστε τα δεδομένα από το Drive και από το snapshot του δίσκου (Arrow) να είναι ίδια
+            for col in df.select_dtypes(include='object').columns:
+                values = df[col]
+                if len({type(value) for value in pd.unique(values.dropna())}) > 1:
+                    df[col] = values.where(values.isna(), values.astype(str))
             
-            # Ειδική μεταχείριση για Τρέχον Υπόλοιπο
-            if 'Τρέχον Υπόλοιπο' in self.df.columns:
-                self.df['Τρέχον Υπόλοιπο'] = pd.to_numeric(
-                    self.df['Τρέχον Υπόλοιπο'].astype(str).str.replace(',', '.', regex=False),
-                    errors='coerce'
-                )
+            # Dictionary encoding: κάθε διαφορετικό κείμενο αποθηκεύεται μία φορά, οι γραμμές κρατούν κωδικούς
+            for col in CATEGORICAL_COLUMNS:
+                if col in df.columns:
+                    df[col] = df[col].astype('category')
+        return df
+    
+    def get_cached_report(self, snapshot, name, as_of=None):
+        """Επιστρέφει την EncodedResponse από την cache ή None"""
+        cached = self.lookup_report(snapshot, name, as_of)
+        metrics.inc('minicrm_report_cache_total', result='miss' if cached is None else 'hit')
+        return cached
+    
+    def lookup_report(self, snapshot, name, as_of=None):
+        cache = self.report_cache if as_of is None else self.as_of_reports
+        return cache.get(self._report_key(snapshot, name, as_of))
+    
+    def store_report(self, snapshot, name, body, as_of=None):
+        """Αποθήκευση σειριοποιημένης αναφοράς για την έκδοση δεδομένων του στιγμιότυπου"""
+        key = self._report_key(snapshot, name, as_of)
+        etag = hashlib.md5('|'.join(key).encode('utf-8')).hexdigest()
+        cached = EncodedResponse(body, etag)
+        if as_of is None:
+            self.report_cache[key] = cached
+        else:
+            self.as_of_reports[key] = cached
+        return cached
+    
+    def _report_key(self, snapshot, name, as_of=None):
+        # Ανά πελάτη: η αναφορά αλλάζει μόνο αν άλλαξαν οι γραμμές του ή οι μήνες του φύλλου.
+        # Οι ημέρες πίστωσης εξαρτώνται και από τη σημερινή ημερομηνία (ή την as_of).
+        day = f"as_of={as_of.date().isoformat()}" if as_of is not None else datetime.now().date().isoformat()
+        return (name, str(snapshot.client_digests.get(name)), snapshot.months_version, day)
+    
+    def _retain_reports(self, snapshot):
+        """
+        Σε κάθε ανανέωση (και όταν το αρχείο δεν άλλαξε) κρατά μόνο τις αναφορές
+        των πελατών που δεν άλλαξαν· οι χωρίς as_of μόνο αν είναι της σημερινής ημέρας.
+        """
+        today = datetime.now().date().isoformat()
+        self.report_cache = {
+            key: cached for key, cached in list(self.report_cache.items())
+            if key[:3] == self._report_key(snapshot, key[0])[:3] and key[3] == today
+        }
+        self.as_of_reports.retain(lambda key: key[:3] == self._report_key(snapshot, key[0])[:3])
 
 # Δημιουργία global instance
 data_loader = GoogleDriveDataLoader()
 
+MAX_BATCH_CLIENTS = 200  # Όριο πελατών ανά αίτημα /clients/batch
+EXPORT_CHUNK_CLIENTS = 100  # Πελάτες ανά συλλογή γραμμών στο /export
+EXPORT_CHUNK_BYTES = 64 * 1024  # Μέγεθος κομματιών της ροής του /export
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+def _snapshot_gauge(value):
+    # Gauges που διαβάζουν το τρέχον στιγμιότυπο τη στιγμή του scrape
+    def collect():
+        snapshot = data_loader.snapshot
+        return {(): value(snapshot)} if snapshot is not None else {}
+    return collect
+
+metrics.gauge('minicrm_dataframe_rows', 'Γραμμές στα φορτωμένα δεδομένα', _snapshot_gauge(lambda s: len(s.df)))
+metrics.gauge('minicrm_dataframe_memory_bytes', 'Μνήμη του φορτωμένου DataFrame', _snapshot_gauge(lambda s: s.memory_bytes))
+metrics.gauge('minicrm_clients', 'Πλήθος πελατών στα φορτωμένα δεδομένα', _snapshot_gauge(lambda s: len(s.client_index)))
+metrics.gauge('minicrm_data_age_seconds', 'Δευτερόλεπτα από τον τελευταίο έλεγχο στο Drive',
+              lambda: {(): time.time() - data_loader.last_loaded} if data_loader.last_loaded else {})
+metrics.gauge('minicrm_report_cache_entries', 'Αναφορές πελατών στην cache',
+              lambda: {(): len(data_loader.report_cache) + len(data_loader.as_of_reports)})
+
 def clean_for_json(obj):
     """Καθαρισμός δεδομένων για JSON serialization"""
     if isinstance(obj, dict):
@@ -581,92 +1865,91 @@ def clean_for_json(obj):
         return int(obj)
     return obj
 
-def parse_month_data(month_str):
-    """Εξάγει μήνα και έτος από διάφορα formats"""
-    if pd.isna(month_str):
-        return None, None
-        
-    month_str = str(month_str).strip()
-    
-    match = re.match(r'^\((\d{1,2})\)', month_str)
-    if match:
-        month = int(match.group(1))
-        return month, None
-    
-    for pattern in [r'^(\d{1,2})_(\d{4})$', r'^(\d{1,2})/(\d{4})$', r'^(\d{1,2})-(\d{4})$']:
-        match = re.match(pattern, month_str)
-        if match:
-            return int(match.group(1)), int(match.group(2))
-    
-    return None, None
+MIN_COMPRESS_BYTES = 1024  # Μικρότερες απαντήσεις στέλνονται ασυμπίεστες
+
+def _json_default(obj):
+    # Αριθμοί NumPy που δεν πέρασαν από καθαρισμό
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
-def calculate_credit_days(client_df, balance):
+def encode_json(data):
+    """JSON σε UTF-8 bytes: orjson όταν είναι εγκατεστημένο, αλλιώς json"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def preferred_encoding(size):
+    """Η καλύτερη συμπίεση που δέχεται ο client για σώμα size bytes (None = καμία)"""
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def json_response(data, status=200):
+    return app.response_class(encode_json(data), status=status, mimetype='application/json')
+
+def finite_or_zero(data):
+    """NaN/±inf -> 0 σε Series/DataFrame (ό,τι έκανε το clean_for_json ανά τιμή)"""
+    return data.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+def calculate_credit_days(client_df, balance, trace=None, as_of=None):
     """
-    ΤΕΛΙΚΗ ΛΥΣΗ: Υπολογισμός ημερών πίστωσης με σωστή προσθήκη όλων των ημερών
+    ΤΕΛΙΚΗ ΛΥΣΗ: Υπολογισμός ημερών πίστωσης με σωστή προσθήκη όλων των ημερών.
+    Με trace (λίστα) καταγράφονται τα βήματα του υπολογισμού ως dicts (explain mode).
+    Με as_of ο υπολογισμός γίνεται σε εκείνη την ημερομηνία, αγνοώντας τους μεταγενέστερους μήνες.
     """
-    print(f"\n=== ΥΠΟΛΟΓΙΣΜΟΣ ΗΜΕΡΩΝ ΠΙΣΤΩΣΗΣ ===")
-    print(f"Balance: {balance}, Type: {type(balance)}")
+    if trace is not None:
+        trace.append({'step': 'input', 'balance': balance, 'rows': len(client_df)})
     
     if not isinstance(balance, (int, float)) or balance <= 0:
-        print(f"Invalid balance: {balance}")
+        if trace is not None:
+            trace.append({'step': 'result', 'reason': 'invalid_balance', 'days': '-'})
         return '-'
     
-    working_df = client_df.copy()
-    print(f"Total rows for client: {len(working_df)}")
-    
-    # Τρέχουσα ημερομηνία
-    today = datetime.now()
+    # Τρέχουσα ημερομηνία (ή η ημερομηνία αναφοράς)
+    today = as_of or datetime.now()
     current_year = today.year
     current_month = today.month
     current_day = today.day
     
-    print(f"Today: {today.strftime('%Y-%m-%d')} (Day {current_day} of month {current_month})")
-    
-    # Parsing μηνών
-    month_year_data = []
-    for idx, row in working_df.iterrows():
-        month_str = row.get('Μήνας', '')
-        year_from_col = row.get('Ετος', None)
-        month, year = parse_month_data(month_str)
-        
-        if year is None and pd.notna(year_from_col):
-            year = int(year_from_col)
-        
-        if year is None:
-            year = current_year
-            
-        month_year_data.append({
-            'month': month,
-            'year': year,
-            'amount': row.get('Μικτό ποσό', 0)
-        })
-    
-    # Φιλτράρισμα έγκυρων δεδομένων
-    valid_data = [
-        d for d in month_year_data 
-        if d['month'] is not None and d['year'] is not None and pd.notna(d['amount'])
-    ]
-    
-    print(f"Valid records: {len(valid_data)}")
-    
-    if len(valid_data) == 0:
-        print("No valid data found")
+    # Έγκυρα δεδομένα: μήνας/έτος έχουν ήδη αναλυθεί κατά τη φόρτωση
+    if 'month' not in client_df.columns or 'Μικτό ποσό' not in client_df.columns:
+        if trace is not None:
+            trace.append({'step': 'result', 'reason': 'no_valid_data', 'days': '-'})
         return '-'
+    valid_df = client_df[(client_df['month'] > 0) & client_df['Μικτό ποσό'].notna()]
+    if as_of is not None:
+        valid_df = valid_df[valid_df['year'] * 12 + valid_df['month'] <= as_of.year * 12 + as_of.month]
     
-    # Συνάθροιση ανά μήνα/έτος
-    month_totals = {}
-    for d in valid_data:
-        key = (d['year'], d['month'])
-        if key not in month_totals:
-            month_totals[key] = 0
-        month_totals[key] += d['amount']
+    if len(valid_df) == 0:
+        if trace is not None:
+            trace.append({'step': 'result', 'reason': 'no_valid_data', 'days': '-'})
+        return '-'
     
-    # Ταξινόμηση από το πιο πρόσφατο στο παλιότερο
-    sorted_months = sorted(month_totals.items(), key=lambda x: (x[0][0], x[0][1]), reverse=True)
+    # Συνάθροιση ανά μήνα/έτος, από το πιο πρόσφατο στο παλιότερο
+    month_totals = valid_df.groupby(['year', 'month'])['Μικτό ποσό'].sum()
+    sorted_months = [
+        ((int(year), int(month)), amount)
+        for (year, month), amount in month_totals.sort_index(ascending=False).items()
+    ]
     
-    print(f"\nMonthly totals (most recent first):")
-    for (year, month), amount in sorted_months:
-        print(f"  {month:2d}/{year}: {amount:8.2f}€")
+    if trace is not None:
+        trace.append({
+            'step': 'monthly_totals',
+            'today': today.strftime('%Y-%m-%d'),
+            'valid_rows': len(valid_df),
+            'months': [{'month': f"{month:02d}/{year}", 'amount': round(float(amount), 2)}
+                       for (year, month), amount in sorted_months]
+        })
     
     # ΝΕΑ ΠΡΟΣΕΓΓΙΣΗ: Δυο-φασικός υπολογισμός
     
@@ -676,10 +1959,7 @@ def calculate_credit_days(client_df, balance):
     partial_days_needed = 0
     total_revenue = sum(amount for _, amount in sorted_months)
     
-    print(f"\n--- ΦΑΣΗ 1: ΕΞΡΕΣΗ ΜΗΝΑ ΚΑΛΥΨΗΣ ---")
     for i, ((year, month), amount) in enumerate(sorted_months):
-        print(f"Month {i}: {month}/{year}, Amount: {amount:.2f}€")
-        
         if amount > 0:  # Μόνο μήνες με τζίρο μπορούν να καλύψουν balance
             if cumulative + amount >= balance:
                 covering_month_index = i
@@ -691,46 +1971,51 @@ def calculate_credit_days(client_df, balance):
                 daily_rate = amount / days_in_covering_month
                 partial_days_needed = remaining_needed / daily_rate if daily_rate > 0 else 0
                 
-                print(f"  ** COVERING MONTH FOUND at index {i} **")
-                print(f"  Remaining needed: {remaining_needed:.2f}€")
-                print(f"  Partial days needed: {partial_days_needed:.2f}")
+                if trace is not None:
+                    trace.append({
+                        'step': 'covering_month',
+                        'index': i,
+                        'month': f"{month:02d}/{year}",
+                        'cumulative_before': round(float(cumulative), 2),
+                        'remaining_needed': round(float(remaining_needed), 2),
+                        'days_in_month': int(days_in_covering_month),
+                        'partial_days': round(float(partial_days_needed), 2)
+                    })
                 break
             else:
                 cumulative += amount
-                print(f"  Not enough. Cumulative: {cumulative:.2f}€")
     
     # ΦΑΣΗ 2: Μέτρησε ΟΛΕΣ τις ημέρες
     total_days = 0
-    
-    print(f"\n--- ΦΑΣΗ 2: ΜΕΤΡΗΣΗ ΟΛΩΝ ΤΩΝ ΗΜΕΡΩΝ ---")
+    counted = [] if trace is not None else None
     
     if covering_month_index == -1:
         # Δεν βρέθηκε μήνας κάλυψης - αναλογικός υπολογισμός
-        print("No covering month found - using proportional calculation")
-        
         # Μέτρησε όλες τις ημέρες
         for i, ((year, month), amount) in enumerate(sorted_months):
             is_current_month = (year == current_year and month == current_month)
             days_used = current_day if is_current_month else calendar.monthrange(year, month)[1]
             total_days += days_used
-            print(f"  Month {i}: +{days_used} days, Total: {total_days}")
+            if counted is not None:
+                counted.append({'month': f"{month:02d}/{year}", 'days': days_used, 'total': total_days})
         
         if total_revenue > 0:
             revenue_ratio = balance / total_revenue
             proportional_days = total_days * revenue_ratio
             
-            print(f"\nProportional calculation:")
-            print(f"  Total days in data: {total_days}")
-            print(f"  Revenue ratio: {revenue_ratio:.2f}x")
-            print(f"  Result: {total_days} × {revenue_ratio:.2f} = {proportional_days:.1f}")
-            
             result = round(proportional_days)
-            print(f"\n📊 PROPORTIONAL RESULT: {result} days")
+            if trace is not None:
+                trace.append({
+                    'step': 'proportional',
+                    'months': counted,
+                    'total_days': total_days,
+                    'total_revenue': round(float(total_revenue), 2),
+                    'revenue_ratio': round(float(revenue_ratio), 4)
+                })
+                trace.append({'step': 'result', 'days': result})
             return result
     else:
         # Βρέθηκε μήνας κάλυψης - κανονικός υπολογισμός
-        print(f"Covering month found at index {covering_month_index}")
-        
         # Μέτρησε ΟΛΕΣ τις ημέρες μέχρι και τον μήνα κάλυψης
         for i, ((year, month), amount) in enumerate(sorted_months):
             is_current_month = (year == current_year and month == current_month)
@@ -739,15 +2024,20 @@ def calculate_credit_days(client_df, balance):
             if i < covering_month_index:
                 # Μήνες ΜΕΤΑ τον μήνα κάλυψης - προσθέτουμε όλες τις ημέρες
                 total_days += days_used
-                print(f"  Month {i} (after covering): +{days_used} days, Total: {total_days}")
             elif i == covering_month_index:
                 # Ο μήνας κάλυψης - προσθέτουμε μερικές ημέρες
+                days_used = partial_days_needed
                 total_days += partial_days_needed
-                print(f"  Month {i} (covering): +{partial_days_needed:.2f} days, Total: {total_days:.2f}")
+            if counted is not None:
+                counted.append({'month': f"{month:02d}/{year}", 'days': round(float(days_used), 2), 'total': round(float(total_days), 2)})
+            if i == covering_month_index:
                 break
+        if trace is not None:
+            trace.append({'step': 'count_days', 'months': counted, 'total_days': round(float(total_days), 2)})
     
     result = round(total_days) if total_days > 0 else '-'
-    print(f"\n✅ FINAL RESULT: {result} days")
+    if trace is not None:
+        trace.append({'step': 'result', 'days': result})
     return result
 
 def calculate_collectible_amount(balance, credit_days, agreement_days):
@@ -771,173 +2061,845 @@ def calculate_collectible_amount(balance, credit_days, agreement_days):
     
     return round(collectible_amount, 2)
 
+# Precompiled patterns για τα formats της στήλης Μήνας
+MONTH_ONLY_PATTERN = re.compile(r'^\((\d{1,2})\)')
+MONTH_YEAR_PATTERN = re.compile(r'^(\d{1,2})[_/-](\d{4})$')
+
+# Ημέρες ανά μήνα (μη δίσεκτο έτος), index = μήνας - 1
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def parse_month_columns(month_series, year_series=None, default_year=None):
+    """
+    Vectorized ανάλυση της στήλης Μήνας: formats (MM), MM_YYYY, MM/YYYY, MM-YYYY.
+    Το έτος λαμβάνεται από το format, αλλιώς από τη στήλη Ετος, αλλιώς το τρέχον.
+    Επιστρέφει πίνακες (έτος, μήνας) με 0 όπου ο μήνας δεν αναγνωρίζεται.
+    """
+    if default_year is None:
+        default_year = datetime.now().year
+    
+    text = month_series.astype(str).str.strip().where(month_series.notna())
+    month_only = text.str.extract(MONTH_ONLY_PATTERN, expand=False)
+    month_year = text.str.extract(MONTH_YEAR_PATTERN)
+    
+    month = pd.to_numeric(month_only.fillna(month_year[0]), errors='coerce')
+    year = pd.to_numeric(month_year[1].where(month_only.isna()), errors='coerce')
+    
+    # Fallback στη στήλη Ετος και μετά στο τρέχον έτος
+    if year_series is not None:
+        year = year.fillna(pd.to_numeric(year_series, errors='coerce'))
+    year = year.fillna(default_year)
+    
+    valid = month.between(1, 12)
+    month = month.where(valid, 0).astype(np.int64).to_numpy()
+    year = year.where(valid, 0).astype(np.int64).to_numpy()
+    return year, month
+
+def days_in_months(years, months, today=None):
+    """Ημέρες κάθε μήνα, με τις ημέρες που έχουν περάσει για τον τρέχοντα μήνα"""
+    if today is None:
+        today = datetime.now()
+    leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    days = DAYS_IN_MONTH[months - 1] + ((months == 2) & leap)
+    is_current_month = (years == today.year) & (months == today.month)
+    return np.where(is_current_month, today.day, days)
+
+def sort_month_labels(df):
+    """Μοναδικές ετικέτες Μήνα σε χρονολογική (όχι αλφαβητική) σειρά"""
+    if df is None or df.empty or 'Μήνας' not in df.columns:
+        return []
+    labels = df['Μήνας']
+    if 'month' in df.columns:
+        # Μη αναγνωρίσιμοι μήνες στο τέλος
+        period = np.where(df['month'] > 0, df['year'].astype(np.int64) * 12 + df['month'], np.iinfo(np.int64).max)
+    else:
+        period = np.zeros(len(df), dtype=np.int64)
+    first_period = pd.Series(period, index=labels.index)[labels.notna()].groupby(labels.dropna(), observed=True).min()
+    return sorted(first_period.index.tolist(), key=lambda label: (first_period[label], str(label)))
+
+def calculate_credit_summary(df, today=None):
+    """
+    Ημέρες πίστωσης και εισπρακτέο ποσό για όλους τους πελάτες σε ένα πέρασμα.
+    Ίδιος αλγόριθμος με τα calculate_credit_days / calculate_collectible_amount,
+    με groupby και σωρευτικά αθροίσματα αντί για βρόχο ανά πελάτη.
+    Χρειάζεται τις στήλες year/month που προσθέτει το _clean_dataframe.
+    Τιμές που δεν ορίζονται (το '-' της /client) επιστρέφονται ως NaN, και όταν
+    λείπει η στήλη από την οποία προκύπτουν.
+    """
+    columns = ['Τρέχον Υπόλοιπο', 'Ημέρες Βάση Συμφωνίας', 'Ημέρες Πίστωσης', 'Εισπρακτέο Ποσό']
+    if df is None or df.empty or 'Ονομα 1' not in df.columns:
+        return pd.DataFrame(columns=columns)
+    if today is None:
+        today = datetime.now()
+    
+    # Όλοι οι υπολογισμοί γίνονται σε ακέραιους κωδικούς πελάτη (-1 = χωρίς όνομα)
+    codes, names = pd.factorize(df['Ονομα 1'], sort=True)
+    if len(names) == 0:
+        return pd.DataFrame(columns=columns)
+    names = pd.Index(np.asarray(names, dtype=object), name='Ονομα 1')
+    has_client = codes >= 0
+    first_columns = ['Τρέχον Υπόλοιπο', 'ημερες βαση συμφωνιας']
+    firsts = (
+        df.loc[has_client, [col for col in first_columns if col in df.columns]]
+        .groupby(codes[has_client])
+        .first()
+        .reindex(index=range(len(names)), columns=first_columns)
+    )
+    balance = firsts['Τρέχον Υπόλοιπο'].to_numpy()
+    summary = pd.DataFrame({
+        'Τρέχον Υπόλοιπο': balance,
+        'Ημέρες Βάση Συμφωνίας': firsts['ημερες βαση συμφωνιας'].to_numpy(),
+        'Ημέρες Πίστωσης': np.nan,
+        'Εισπρακτέο Ποσό': np.nan,
+    }, index=names)
+    
+    if not {'year', 'month', 'Μικτό ποσό'} <= set(df.columns):
+        return summary[columns]
+    
+    # Μηνιαία σύνολα ανά πελάτη, από τον πιο πρόσφατο μήνα στον παλιότερο
+    year = df['year'].to_numpy(dtype=np.int64)
+    month = df['month'].to_numpy(dtype=np.int64)
+    amount = df['Μικτό ποσό'].to_numpy(dtype=float)
+    valid = has_client & (month > 0) & ~np.isnan(amount)
+    valid &= np.nan_to_num(balance, nan=0.0)[codes] > 0
+    monthly = (
+        pd.DataFrame({'client': codes[valid], 'year': year[valid], 'month': month[valid], 'amount': amount[valid]})
+        .groupby(['client', 'year', 'month'], sort=True)['amount']
+        .sum()
+        .reset_index()
+        .sort_values(['client', 'year', 'month'], ascending=[True, False, False], kind='mergesort')
+        .reset_index(drop=True)
+    )
+    if monthly.empty:
+        return summary[columns]
+    
+    month_clients = monthly['client'].to_numpy()
+    month_balance = balance[month_clients]
+    amounts = monthly['amount'].to_numpy()
+    days = days_in_months(monthly['year'].to_numpy(), monthly['month'].to_numpy(), today)
+    
+    # ΦΑΣΗ 1: σωρευτικός τζίρος (μόνο θετικοί μήνες) πριν από κάθε μήνα
+    positive = pd.Series(np.where(amounts > 0, amounts, 0.0))
+    cumulative_before = (
+        positive.groupby(month_clients, sort=False).cumsum()
+        .groupby(month_clients, sort=False).shift(fill_value=0.0)
+        .to_numpy()
+    )
+    days_before = pd.Series(days).groupby(month_clients, sort=False).cumsum().to_numpy() - days
+    covers = (amounts > 0) & (cumulative_before + amounts >= month_balance)
+    
+    # ΦΑΣΗ 2α: πελάτες με μήνα κάλυψης - όλες οι ημέρες πριν + μερικές ημέρες
+    credit_days = np.full(len(names), np.nan)
+    covering_clients, first_row = np.unique(month_clients[covers], return_index=True)
+    rows = np.flatnonzero(covers)[first_row]
+    daily_rate = amounts[rows] / days[rows]
+    partial_days = (month_balance[rows] - cumulative_before[rows]) / daily_rate
+    total_days = days_before[rows] + partial_days
+    credit_days[covering_clients] = np.where(total_days > 0, np.round(total_days), np.nan)
+    
+    # ΦΑΣΗ 2β: χωρίς μήνα κάλυψης - αναλογικός υπολογισμός σε όλες τις ημέρες
+    uncovered = ~np.isin(month_clients, covering_clients)
+    if uncovered.any():
+        totals = (
+            pd.DataFrame({'days': days[uncovered], 'revenue': amounts[uncovered]})
+            .groupby(month_clients[uncovered], sort=False)
+            .sum()
+        )
+        uncovered_clients = totals.index.to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = balance[uncovered_clients] / totals['revenue'].to_numpy()
+        proportional = np.where(totals['revenue'] > 0, totals['days'] * ratio, totals['days'])
+        credit_days[uncovered_clients] = np.where(proportional > 0, np.round(proportional), np.nan)
+    summary['Ημέρες Πίστωσης'] = credit_days
+    
+    # Εισπρακτέο ποσό
+    credit = summary['Ημέρες Πίστωσης']
+    agreement = summary['Ημέρες Βάση Συμφωνίας']
+    balance = summary['Τρέχον Υπόλοιπο']
+    has_inputs = (balance > 0) & (credit > 0) & (agreement >= 0)
+    excess = (credit - agreement).clip(lower=0)
+    # round() της Python (ανά πελάτη, όχι ανά γραμμή) για ίδια αποτελέσματα με την /client
+    collectible = (balance * (excess / credit)).map(lambda amount: round(amount, 2), na_action='ignore')
+    summary['Εισπρακτέο Ποσό'] = collectible.where(has_inputs)
+    
+    return summary[columns]
+
+def summary_records(summary):
+    """Εγγραφές JSON από σύνοψη πελατών (index Ονομα 1), με '-' όπου η τιμή δεν ορίζεται όπως η /client"""
+    summary = summary.copy()
+    for column in ('Ημέρες Πίστωσης', 'Ημέρες Υπέρβασης'):
+        if column in summary.columns:
+            summary[column] = summary[column].astype('Int64')
+    summary = summary.astype(object).where(summary.notna(), '-')
+    return clean_for_json(summary.rename_axis('Ονομα 1').reset_index().to_dict(orient='records'))
+
+def calculate_credit_history(df, as_of=None):
+    """
+    Ημέρες πίστωσης και εισπρακτέο ποσό κάθε πελάτη στο τέλος κάθε μήνα των δεδομένων του
+    (για τον μήνα της as_of, στην ίδια την as_of), με το τρέχον υπόλοιπο.
+    Ίδιος αλγόριθμος με το calculate_credit_days για κάθε ημερομηνία, αλλά σε ένα πέρασμα:
+    με σωρευτικά αθροίσματα ανά πελάτη ο μήνας κάλυψης κάθε ημερομηνίας βρίσκεται
+    με merge_asof, χωρίς επανάληψη του υπολογισμού ανά ημερομηνία.
+    """
+    columns = ['Ονομα 1', 'Μήνας', 'Ημερομηνία', 'Ημέρες Πίστωσης', 'Εισπρακτέο Ποσό']
+    if df is None or df.empty or 'Ονομα 1' not in df.columns or 'month' not in df.columns:
+        return pd.DataFrame(columns=columns)
+    if as_of is None:
+        as_of = datetime.now()
+    
+    codes, names = pd.factorize(df['Ονομα 1'], sort=True)
+    names = np.asarray(names, dtype=object)
+    has_client = codes >= 0
+    firsts = (
+        df.loc[has_client, ['Τρέχον Υπόλοιπο', 'ημερες βαση συμφωνιας']]
+        .groupby(codes[has_client])
+        .first()
+        .reindex(range(len(names)))
+    )
+    balance = firsts['Τρέχον Υπόλοιπο'].to_numpy()
+    agreement = firsts['ημερες βαση συμφωνιας'].to_numpy()
+    
+    # Μηνιαία σύνολα ανά πελάτη σε αύξουσα σειρά, μέχρι και τον μήνα της as_of
+    period = df['year'].to_numpy(dtype=np.int64) * 12 + df['month'].to_numpy(dtype=np.int64)
+    amount = df['Μικτό ποσό'].to_numpy(dtype=float)
+    valid = has_client & (df['month'].to_numpy() > 0) & ~np.isnan(amount)
+    valid &= period <= as_of.year * 12 + as_of.month
+    valid &= np.nan_to_num(balance, nan=0.0)[codes] > 0
+    monthly = (
+        pd.DataFrame({'client': codes[valid], 'period': period[valid], 'amount': amount[valid]})
+        .groupby(['client', 'period'], sort=True)['amount']
+        .sum()
+        .reset_index()
+    )
+    if monthly.empty:
+        return pd.DataFrame(columns=columns)
+    
+    clients = monthly['client'].to_numpy()
+    years, months = np.divmod(monthly['period'].to_numpy() - 1, 12)
+    months += 1
+    amounts = monthly['amount'].to_numpy()
+    month_balance = balance[clients]
+    days = days_in_months(years, months, as_of)
+    
+    # Σωρευτικά ανά πελάτη: θετικός τζίρος, συνολικός τζίρος και ημέρες
+    positive = np.where(amounts > 0, amounts, 0.0)
+    by_client = pd.DataFrame({'positive': positive, 'revenue': amounts, 'days': days}).groupby(clients, sort=False).cumsum()
+    positive_total = by_client['positive'].to_numpy()
+    revenue_total = by_client['revenue'].to_numpy()
+    days_total = by_client['days'].to_numpy()
+    
+    # ΦΑΣΗ 1 για κάθε ημερομηνία j: μήνας κάλυψης είναι ο πιο πρόσφατος μήνας m <= j με τζίρο
+    # και θετικό τζίρο από m έως j >= υπόλοιπο, δηλαδή θετικός τζίρος πριν από m <= τζίρος έως j - υπόλοιπο
+    points = pd.DataFrame({'client': clients, 'target': positive_total - month_balance, 'point': np.arange(len(monthly))})
+    candidates = pd.DataFrame({'client': clients, 'before': positive_total - positive, 'covering': np.arange(len(monthly))})[amounts > 0]
+    matched = pd.merge_asof(
+        points.sort_values('target', kind='mergesort'),
+        candidates.sort_values(['before', 'covering'], kind='mergesort'),
+        left_on='target', right_on='before', by='client', direction='backward'
+    ).sort_values('point')
+    covering = matched['covering'].to_numpy()
+    covered = ~np.isnan(covering)
+    
+    # ΦΑΣΗ 2α: ημέρες των μηνών μετά τον μήνα κάλυψης + μερικές ημέρες του μήνα κάλυψης
+    credit_days = np.full(len(monthly), np.nan)
+    j = np.flatnonzero(covered)
+    m = covering[covered].astype(np.int64)
+    remaining = month_balance[j] - (positive_total[j] - positive_total[m])
+    partial_days = remaining / (amounts[m] / days[m])
+    total_days = days_total[j] - days_total[m] + partial_days
+    credit_days[j] = np.where(total_days > 0, np.round(total_days), np.nan)
+    
+    # ΦΑΣΗ 2β: χωρίς μήνα κάλυψης - αναλογικός υπολογισμός σε όλες τις ημέρες έως j
+    j = np.flatnonzero(~covered)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proportional = np.where(revenue_total[j] > 0, days_total[j] * month_balance[j] / revenue_total[j], days_total[j])
+    credit_days[j] = np.where(proportional > 0, np.round(proportional), np.nan)
+    
+    # Εισπρακτέο ποσό, όπως στο calculate_credit_summary
+    credit = pd.Series(credit_days)
+    month_agreement = pd.Series(agreement[clients])
+    has_inputs = (month_balance > 0) & (credit > 0) & (month_agreement >= 0)
+    excess = (credit - month_agreement).clip(lower=0)
+    collectible = (month_balance * (excess / credit)).map(lambda value: round(value, 2), na_action='ignore')
+    
+    # Ημερομηνία κάθε σημείου: τέλος του μήνα, ή η as_of για τον μήνα της (όσες και οι ημέρες του)
+    dates = [f"{year}-{month:02d}-{day:02d}" for year, month, day in zip(years, months, days)]
+    return pd.DataFrame({
+        'Ονομα 1': names[clients],
+        'Μήνας': [f"{month:02d}/{year}" for year, month in zip(years, months)],
+        'Ημερομηνία': dates,
+        'Ημέρες Πίστωσης': credit_days,
+        'Εισπρακτέο Ποσό': collectible.where(has_inputs).to_numpy()
+    })
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Ανά endpoint (όχι ανά URL) ώστε να μη δημιουργούνται άπειρες σειρές
+    if 'request_start' in g:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('minicrm_http_request_seconds', time.perf_counter() - g.request_start, endpoint=endpoint)
+        metrics.inc('minicrm_http_requests_total', endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli για μεγάλες απαντήσεις JSON/HTML που δεν είναι ήδη συμπιεσμένες"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'text/html')):
+        return response
+    body = response.get_data()
+    encoding = preferred_encoding(len(body))
+    if encoding:
+        response.set_data(compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    return response
+
+@lru_cache(maxsize=None)
+def index_template():
+    """Το HTML_TEMPLATE μεταγλωττίζεται μία φορά ανά process"""
+    return app.jinja_env.from_string(HTML_TEMPLATE)
+
+def send_encoded(cached, mimetype, last_modified=None):
+    """
+    Απάντηση από EncodedResponse: συμπιεσμένη εκδοχή αν τη δέχεται ο client,
+    strong ETag ανά εκδοχή και 304 όταν ο browser έχει ήδη το ίδιο περιεχόμενο.
+    """
+    encoding = preferred_encoding(len(cached.body))
+    response = app.response_class(cached.encoded(encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{cached.etag}-{encoding}" if encoding else cached.etag)
+    if last_modified is not None:
+        response.last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def report_last_modified(snapshot, as_of=None):
+    """
+    Last-Modified για απαντήσεις που χωρίς as_of εξαρτώνται και από τη σημερινή ημέρα:
+    όχι πριν από τα μεσάνυχτα, ώστε ένα If-Modified-Since της χθεσινής να μη δώσει 304.
+    """
+    if as_of is not None:
+        return snapshot.loaded_at
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(snapshot.loaded_at, midnight.timestamp())
+
+def cached_snapshot_response(snapshot, key, build, cache=None):
+    """EncodedResponse που υπολογίζεται μία φορά ανά στιγμιότυπο δεδομένων (στο snapshot.responses ή στο cache)"""
+    cache = snapshot.responses if cache is None else cache
+    cached = cache.get(key)
+    if cached is None:
+        body = build()
+        cached = cache[key] = EncodedResponse(body, hashlib.md5(body).hexdigest())
+    return cached
+
+def render_index(snapshot):
+    df = snapshot.df
+    client_names = snapshot.client_names
+    
+    # Έλεγχος κατάστασης δεδομένων
+    error_message = None
+    status_message = None
+    
+    if df.empty:
+        error_message = "Δεν ήταν δυνατή η φόρτωση δεδομένων από το Google Drive. Ελέγξτε το File ID και τις ρυθμίσεις."
+    elif len(client_names) > 0:
+        status_message = f"Φορτώθηκαν επιτυχώς {len(df)} εγγραφές με {len(client_names)} πελάτες."
+    
+    return render_template(index_template(),
+                           clients=client_names,
+                           error_message=error_message,
+                           status_message=status_message).encode('utf-8')
+
 @app.route('/')
 def index():
     try:
-        df = data_loader.get_dataframe()
-        client_names = sorted(df['Ονομα 1'].dropna().unique().tolist()) if not df.empty else []
-        
-        # Έλεγχος κατάστασης δεδομένων
-        error_message = None
-        status_message = None
-        
-        if df.empty:
-            error_message = "Δεν ήταν δυνατή η φόρτωση δεδομένων από το Google Drive. Ελέγξτε το File ID και τις ρυθμίσεις."
-        elif len(client_names) > 0:
-            status_message = f"Φορτώθηκαν επιτυχώς {len(df)} εγγραφές με {len(client_names)} πελάτες."
-        
-        return render_template_string(HTML_TEMPLATE, 
-                                    clients=client_names,
-                                    error_message=error_message,
-                                    status_message=status_message)
-                                    
+        snapshot = data_loader.get_snapshot()
+        cached = cached_snapshot_response(snapshot, 'index', lambda: render_index(snapshot))
+        return send_encoded(cached, 'text/html')
+        
     except Exception as e:
         logging.error(f"Error in index route: {e}")
         error_message = f"Σφάλμα εφαρμογής: {str(e)}"
-        return render_template_string(HTML_TEMPLATE, 
-                                    clients=[],
-                                    error_message=error_message,
-                                    status_message=None)
+        return render_template(index_template(),
+                               clients=[],
+                               error_message=error_message,
+                               status_message=None)
 
 @app.route('/clients-list')
 def get_clients_list():
     try:
-        df = data_loader.get_dataframe()
-        client_names = sorted(df['Ονομα 1'].dropna().unique().tolist()) if not df.empty else []
-        return jsonify(client_names)
+        snapshot = data_loader.get_snapshot()
+        cached = cached_snapshot_response(snapshot, 'clients-list', lambda: encode_json(snapshot.client_names))
+        return send_encoded(cached, 'application/json')
     except Exception as e:
         logging.error(f"Error getting clients list: {e}")
         return jsonify([])
 
+@app.route('/clients/search')
+def search_clients():
+    """Fuzzy αναζήτηση πελάτη (φωνητική αναζήτηση) - επιστρέφει τα top-k ονόματα"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query'}), 400
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        
+        snapshot = data_loader.get_snapshot()
+        matches = snapshot.search_index.search(query, limit)
+        return jsonify([{'name': name, 'score': score} for name, score in matches])
+    except Exception as e:
+        logging.error(f"Error searching clients: {e}")
+        return jsonify({'error': f'Σφάλμα αναζήτησης: {str(e)}'}), 500
+
+def parse_as_of(value):
+    """Ημερομηνία αναφοράς από το query string (YYYY-MM-DD) ή None - ValueError αν δεν είναι έγκυρη"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def parse_month_param(value):
+    """Μήνας από το query string (YYYY-MM) ως περίοδος year * 12 + month ή None - ValueError αν δεν είναι έγκυρος"""
+    if not value:
+        return None
+    month = datetime.strptime(value, '%Y-%m')
+    return month.year * 12 + month.month
+
+def build_client_report(name, client_df, available_months, trace=None, as_of=None):
+    """Υπολογισμός της αναφοράς ενός πελάτη (έτοιμη για JSON).
+    Με trace (λίστα) καταγράφονται τα βήματα ημερών πίστωσης και εισπρακτέου ποσού.
+    Με as_of οι ημέρες πίστωσης υπολογίζονται σε εκείνη την ημερομηνία."""
+    # Τρέχον υπόλοιπο
+    balance_series = client_df['Τρέχον Υπόλοιπο'].dropna()
+    balance = balance_series.iloc[0] if not balance_series.empty else '-'
+    
+    # Ημέρες βάση συμφωνίας
+    agreement_days_series = client_df['ημερες βαση συμφωνιας'].dropna()
+    agreement_days = agreement_days_series.iloc[0] if not agreement_days_series.empty else '-'
+    
+    # Μεταχ
+    metax_series = client_df['Μεταχ'].dropna()
+    metax = metax_series.iloc[0] if not metax_series.empty else 0
+
+    # Υπολογισμός ημερών πίστωσης
+    with metrics.timer('minicrm_client_stage_seconds', stage='credit_days'):
+        credit_days = calculate_credit_days(client_df, balance, trace, as_of)
+    
+    # Υπολογισμός εισπρακτέου ποσού
+    collectible_amount = '-'
+    if (balance != '-' and credit_days != '-' and agreement_days != '-'):
+        collectible_amount = calculate_collectible_amount(balance, credit_days, agreement_days)
+    if trace is not None:
+        trace.append({
+            'step': 'collectible_amount',
+            'balance': balance,
+            'credit_days': credit_days,
+            'agreement_days': agreement_days,
+            'amount': collectible_amount
+        })
+
+    # Υλικά με περιγραφή και τιμές (με τη σειρά πρώτης εμφάνισης)
+    pivots_start = time.perf_counter()
+    by_material = client_df.groupby('Υλικό', sort=False, observed=True)
+    materials = pd.DataFrame(index=pd.Index(by_material.size().index, name='Υλικό'))
+    
+    if 'Περιγραφή Υλικού' in client_df.columns:
+        descriptions = by_material['Περιγραφή Υλικού'].first().astype(object)
+        materials['Περιγραφή'] = descriptions.where(descriptions.notna(), '')
+    else:
+        materials['Περιγραφή'] = ''
+    
+    if 'τιμή ανα συσκευασία' in client_df.columns:
+        # Τελευταία μη κενή τιμή· round() της Python ανά υλικό, όπως πριν
+        prices = by_material['τιμή ανα συσκευασία'].last()
+        materials['Τιμή ανά συσκευασία'] = finite_or_zero(prices.map(lambda price: round(float(price), 2), na_action='ignore'))
+    else:
+        materials['Τιμή ανά συσκευασία'] = 0
+
+    # Μηνιαίος τζίρος
+    monthly_turnover = finite_or_zero(
+        client_df.groupby('Μήνας', observed=True)['Μικτό ποσό']
+        .sum()
+        .reindex(available_months, fill_value=0)
+        .round(2)
+    ).to_dict()
+    # Κλειδιά πάντα κείμενο (όπως στις γραμμές υλικών): το orjson δεν δέχεται αριθμητικά κλειδιά
+    monthly_turnover = {str(month): amount for month, amount in monthly_turnover.items()}
+
+    # Κατανόμη υλικών: υλικά × μήνες, 0 όπου δεν υπάρχουν ποσά
+    if 'Τιμολ.ποσ.' in client_df.columns:
+        material_usage = (
+            client_df.groupby(['Υλικό', 'Μήνας'], observed=True)['Τιμολ.ποσ.']
+            .sum()
+            .unstack(fill_value=0)
+            .reindex(index=materials.index, columns=available_months, fill_value=0)
+            .round(2)
+        )
+    else:
+        material_usage = pd.DataFrame(0, index=materials.index, columns=available_months)
+    material_usage.columns = [str(month) for month in available_months]
+
+    # Συνδυασμός υλικού με τιμή και ποσά, καθαρισμός NaN/inf σε επίπεδο DataFrame
+    detailed_materials = (
+        pd.concat([materials, finite_or_zero(material_usage)], axis=1)
+        .reset_index()
+        .to_dict(orient='records')
+    )
+    metrics.observe('minicrm_client_stage_seconds', time.perf_counter() - pivots_start, stage='pivots')
+
+    # Απάντηση: οι πίνακες είναι ήδη καθαροί, μένουν μόνο τα μεμονωμένα πεδία
+    response_data = {
+        'Ονομα 1': name,
+        'Πληρωτής': clean_for_json(client_df['Πληρωτής'].iloc[0]) if 'Πληρωτής' in client_df.columns else '-',
+        'Μεταχ': clean_for_json(metax),
+        'Τρέχον Υπόλοιπο': clean_for_json(balance),
+        'Ημέρες Πίστωσης': clean_for_json(credit_days),
+        'Ημέρες Βάση Συμφωνίας': clean_for_json(agreement_days),
+        'Εισπρακτέο Ποσό': clean_for_json(collectible_amount),
+        'Μήνες': available_months,
+        'Μηνιαίος Τζίρος': monthly_turnover,
+        'Υλικά': detailed_materials
+    }
+
+    return response_data
+
+def compute_client_report(snapshot, name, as_of=None):
+    """Υπολογισμός, σειριοποίηση και αποθήκευση στην cache της αναφοράς (None αν δεν υπάρχει ο πελάτης)"""
+    # Ίσως την ολοκλήρωσε άλλο αίτημα μετά τον δικό μας έλεγχο στην cache
+    cached = data_loader.lookup_report(snapshot, name, as_of)
+    if cached is not None:
+        return cached
+    with metrics.timer('minicrm_client_stage_seconds', stage='lookup'):
+        client_df = snapshot.get_client_rows(name)
+    if client_df.empty:
+        return None
+    report = build_client_report(name, client_df, snapshot.available_months, as_of=as_of)
+    with metrics.timer('minicrm_client_stage_seconds', stage='serialize'):
+        body = encode_json(report)
+    return data_loader.store_report(snapshot, name, body, as_of)
+
 @app.route('/client')
 def get_client_data():
     try:
-        df = data_loader.get_dataframe()
-        if df.empty:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
             return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
             
         name = request.args.get('name')
         if not name:
             return jsonify({'error': 'Missing client name'}), 400
+        try:
+            as_of = parse_as_of(request.args.get('as_of'))
+        except ValueError:
+            return jsonify({'error': 'Invalid as_of date (YYYY-MM-DD)'}), 400
+        
+        if request.args.get('explain') in ('1', 'true', 'yes'):
+            return explain_client_report(snapshot, name, as_of)
 
-        client_df = df[df['Ονομα 1'] == name]
-        if client_df.empty:
-            return jsonify({'error': 'Client not found'}), 404
+        cached = data_loader.get_cached_report(snapshot, name, as_of)
+        if cached is None:
+            # Ταυτόχρονα αιτήματα για την ίδια αναφορά περιμένουν έναν υπολογισμό
+            key = data_loader._report_key(snapshot, name, as_of)
+            cached = data_loader.report_flight.do(key, lambda: compute_client_report(snapshot, name, as_of))
+            if cached is None:
+                return jsonify({'error': 'Client not found'}), 404
+        
+        # Conditional GET: ο browser ξαναρωτά με If-None-Match και παίρνει 304
+        return send_encoded(cached, 'application/json', report_last_modified(snapshot, as_of))
+        
+    except Exception as e:
+        logging.error(f"Error getting client data: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
+
+def explain_client_report(snapshot, name, as_of=None):
+    """Αναφορά πελάτη μαζί με τα βήματα του υπολογισμού (εκτός cache)"""
+    client_df = snapshot.get_client_rows(name)
+    if client_df.empty:
+        return jsonify({'error': 'Client not found'}), 404
+    trace = []
+    report = build_client_report(name, client_df, snapshot.available_months, trace, as_of)
+    report['Ανάλυση'] = clean_for_json(trace)
+    response = json_response(report)
+    response.cache_control.no_store = True
+    return response
 
-        # Τρέχον υπόλοιπο
-        balance_series = client_df['Τρέχον Υπόλοιπο'].dropna()
-        balance = balance_series.iloc[0] if not balance_series.empty else '-'
+def stream_client_reports(snapshot, names):
+    """NDJSON: μία γραμμή JSON ανά πελάτη, με τη σειρά του αιτήματος"""
+    cached_reports = {name: data_loader.get_cached_report(snapshot, name) for name in names}
+    computed = snapshot.iter_clients_rows([name for name in names if cached_reports[name] is None])
+    for name in names:
+        try:
+            cached = cached_reports[name]
+            if cached is None:
+                _, client_df = next(computed)
+                if client_df.empty:
+                    yield encode_json({'Ονομα 1': name, 'error': 'Client not found'}) + b'\n'
+                    continue
+                report = build_client_report(name, client_df, snapshot.available_months)
+                cached = data_loader.store_report(snapshot, name, encode_json(report))
+            yield cached.body + b'\n'
+        except Exception as e:
+            logging.error(f"Error getting client data for {name} in batch: {e}")
+            yield encode_json({'Ονομα 1': name, 'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}) + b'\n'
+
+@app.route('/clients/batch', methods=['POST'])
+def get_clients_batch():
+    """Αναφορές πολλών πελατών σε ένα αίτημα (λίστα ονομάτων ή {"names": [...]}) ως NDJSON"""
+    try:
+        payload = request.get_json(silent=True)
+        names = payload.get('names') if isinstance(payload, dict) else payload
+        if not isinstance(names, list) or not names or not all(isinstance(name, str) for name in names):
+            return jsonify({'error': 'Expected a JSON list of client names'}), 400
+        names = list(dict.fromkeys(names))  # Διπλότυπα μία φορά, με τη σειρά του αιτήματος
+        if len(names) > MAX_BATCH_CLIENTS:
+            return jsonify({'error': f'Too many clients (max {MAX_BATCH_CLIENTS})'}), 400
         
-        # Ημέρες βάση συμφωνίας
-        agreement_days_series = client_df['ημερες βαση συμφωνιας'].dropna()
-        agreement_days = agreement_days_series.iloc[0] if not agreement_days_series.empty else '-'
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
         
-        # Μεταχ
-        metax_series = client_df['Μεταχ'].dropna()
-        metax = metax_series.iloc[0] if not metax_series.empty else 0
+        return app.response_class(stream_client_reports(snapshot, names), mimetype='application/x-ndjson')
+    except Exception as e:
+        logging.error(f"Error getting batch client data: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
+
+EXPORT_CLIENT_FIELDS = ['Ονομα 1', 'Πληρωτής', 'Μεταχ', 'Τρέχον Υπόλοιπο', 'Ημέρες Πίστωσης', 'Ημέρες Βάση Συμφωνίας', 'Εισπρακτέο Ποσό']
+
+def export_header(months):
+    """Στήλες της εξαγωγής: στοιχεία πελάτη, τζίρος ανά μήνα, υλικό και ποσότητες ανά μήνα"""
+    return (EXPORT_CLIENT_FIELDS
+            + [f'Τζίρος {month}' for month in months]
+            + ['Υλικό', 'Περιγραφή', 'Τιμή ανά συσκευασία']
+            + [str(month) for month in months])
 
-        # Υπολογισμός ημερών πίστωσης
-        credit_days = calculate_credit_days(client_df, balance)
+def iter_export_rows(snapshot, names):
+    """
+    Γραμμές της αναφοράς (μία ανά πελάτη και υλικό, τα στοιχεία του πελάτη επαναλαμβάνονται).
+    Οι αναφορές υπολογίζονται ανά ομάδα πελατών, καθώς στέλνεται η απάντηση.
+    """
+    months = snapshot.available_months
+    for start in range(0, len(names), EXPORT_CHUNK_CLIENTS):
+        for name, client_df in snapshot.iter_clients_rows(names[start:start + EXPORT_CHUNK_CLIENTS]):
+            try:
+                report = build_client_report(name, client_df, months)
+            except Exception as e:
+                logging.error(f"Error exporting client {name}: {e}")
+                continue
+            client = [report[field] for field in EXPORT_CLIENT_FIELDS]
+            client += [report['Μηνιαίος Τζίρος'].get(str(month), 0) for month in months]
+            for material in report['Υλικά'] or [{}]:
+                yield client + [
+                    material.get('Υλικό', ''),
+                    material.get('Περιγραφή', ''),
+                    material.get('Τιμή ανά συσκευασία', '')
+                ] + [material.get(str(month), '') for month in months]
+
+def stream_csv(header, rows):
+    """CSV σε κομμάτια· η επικεφαλίδα στέλνεται αμέσως"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM ώστε το Excel να διαβάζει σωστά τα ελληνικά (UTF-8)
+    writer.writerow(header)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def stream_xlsx(header, rows):
+    """
+    XLSX με openpyxl σε write-only mode: οι γραμμές γράφονται στον δίσκο καθώς υπολογίζονται,
+    οπότε η μνήμη μένει σταθερή. Το .xlsx είναι zip και ολοκληρώνεται μόνο στο τέλος,
+    άρα η αποστολή ξεκινά όταν γραφτεί και η τελευταία γραμμή.
+    """
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Αναφορά')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(EXPORT_CHUNK_BYTES), b''):
+            yield chunk
+
+@app.route('/export')
+def export_report():
+    """Αναφορά όλων των πελατών (ή όσων δίνονται με client) ως CSV ή XLSX, σε ροή"""
+    try:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
+        
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Invalid format (use {', '.join(EXPORT_FORMATS)})"}), 400
+        requested = request.args.getlist('client')
+        if requested:
+            names = [name for name in dict.fromkeys(requested) if name in snapshot.client_index]
+            if not names:
+                return jsonify({'error': 'Client not found'}), 404
+        else:
+            names = snapshot.client_names
+        
+        header = export_header(snapshot.available_months)
+        rows = iter_export_rows(snapshot, names)
+        stream = stream_csv if export_format == 'csv' else stream_xlsx
+        response = app.response_class(stream(header, rows), mimetype=EXPORT_FORMATS[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename="export-{datetime.now():%Y%m%d}.{export_format}"'
+        response.cache_control.no_store = True
+        return response
         
-        # Υπολογισμός εισπρακτέου ποσού
-        collectible_amount = '-'
-        if (balance != '-' and credit_days != '-' and agreement_days != '-'):
-            collectible_amount = calculate_collectible_amount(balance, credit_days, agreement_days)
+    except Exception as e:
+        logging.error(f"Error exporting report: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
 
-        # Υλικά με περιγραφή και τιμές
-        materials = []
-        unique_materials = client_df['Υλικό'].dropna().unique()
-        for mat in unique_materials:
-            mat_df = client_df[client_df['Υλικό'] == mat]
-            
-            price = 0
-            if 'τιμή ανα συσκευασία' in mat_df.columns:
-                recent_prices = mat_df['τιμή ανα συσκευασία'].dropna()
-                price = recent_prices.iloc[-1] if not recent_prices.empty else 0
-                
-            description = ''
-            if 'Περιγραφή Υλικού' in mat_df.columns:
-                descriptions = mat_df['Περιγραφή Υλικού'].dropna()
-                description = descriptions.iloc[0] if not descriptions.empty else ''
-                
-            materials.append({
-                'Υλικό': mat,
-                'Περιγραφή': description,
-                'Τιμή ανά συσκευασία': round(float(price), 2) if pd.notna(price) else 0
-            })
+@app.route('/clients-summary')
+def get_clients_summary():
+    """Ημέρες πίστωσης και εισπρακτέο ποσό για όλους τους πελάτες"""
+    try:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
+        
+        # Υπολογίζεται στην ανανέωση (και μία φορά ανά ημέρα)
+        return json_response(summary_records(snapshot.rankings().summary))
+        
+    except Exception as e:
+        logging.error(f"Error getting clients summary: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
 
-        # Μήνες
-        available_months = sorted(df['Μήνας'].dropna().unique().tolist())
+@app.route('/credit-history')
+def get_credit_history():
+    """Ημέρες πίστωσης και εισπρακτέο ποσό στο τέλος κάθε μήνα (ενός πελάτη με name, αλλιώς όλων)"""
+    try:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
+        try:
+            as_of = parse_as_of(request.args.get('as_of'))
+        except ValueError:
+            return jsonify({'error': 'Invalid as_of date (YYYY-MM-DD)'}), 400
+        
+        name = request.args.get('name')
+        if name and name not in snapshot.client_index:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        def build():
+            df = snapshot.get_client_rows(name) if name else snapshot.df
+            history = calculate_credit_history(df, as_of or datetime.now())
+            history['Ημέρες Πίστωσης'] = history['Ημέρες Πίστωσης'].astype('Int64')
+            # Ίδια μορφή με την /clients-summary: '-' όπου η τιμή δεν ορίζεται
+            history = history.astype(object).where(history.notna(), '-')
+            return encode_json(clean_for_json(history.to_dict(orient='records')))
+        
+        # Χωρίς as_of το ιστορικό αλλάζει με την ημέρα (ο τρέχων μήνας μετρά έως σήμερα)
+        day = as_of or datetime.now()
+        cached = cached_snapshot_response(snapshot, ('credit-history', name, day.date().isoformat()), build,
+                                          snapshot.query_responses)
+        return send_encoded(cached, 'application/json', report_last_modified(snapshot, as_of))
+        
+    except Exception as e:
+        logging.error(f"Error getting credit history: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
 
-        # Μηνιαίος τζίρος
-        monthly_turnover = (
-            client_df.groupby('Μήνας')['Μικτό ποσό']
-            .sum()
-            .reindex(available_months, fill_value=0)
-            .round(2)
-            .to_dict()
+@app.route('/aggregate')
+def get_aggregate():
+    """
+    Τζίρος και ποσότητες από το cube πελάτη × υλικού × μήνα.
+    Φίλτρα: client και material (επαναλαμβανόμενα), from/to (YYYY-MM).
+    group_by: λίστα με κόμματα από client, material, month (κενό = ένα σύνολο).
+    """
+    try:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
+        try:
+            start = parse_month_param(request.args.get('from'))
+            end = parse_month_param(request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'Invalid month (YYYY-MM)'}), 400
+        group_by = [dimension for dimension in request.args.get('group_by', '').split(',') if dimension]
+        if any(dimension not in AggregateCube.DIMENSIONS for dimension in group_by) or len(set(group_by)) != len(group_by):
+            return jsonify({'error': 'Invalid group_by (client, material, month)'}), 400
+        
+        result = snapshot.aggregate_cube.query(
+            clients=request.args.getlist('client') or None,
+            materials=request.args.getlist('material') or None,
+            start=start,
+            end=end,
+            group_by=group_by
         )
+        return json_response(result.to_dict(orient='records'))
+        
+    except Exception as e:
+        logging.error(f"Error getting aggregate: {e}")
+        return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
 
-        # Κατανόμη υλικών
-        material_usage = {}
-        if 'Τιμολ.ποσ.' in client_df.columns:
-            material_usage = (
-                client_df.groupby(['Υλικό', 'Μήνας'])['Τιμολ.ποσ.']
-                .sum()
-                .unstack(fill_value=0)
-                .reindex(columns=available_months, fill_value=0)
-                .round(2)
-                .to_dict(orient='index')
-            )
-
-        # Συνδυασμός υλικού με τιμή και ποσά
-        detailed_materials = []
-        for mat in materials:
-            usage = material_usage.get(mat['Υλικό'], {})
-            mat_entry = {
-                'Υλικό': mat['Υλικό'],
-                'Περιγραφή': mat['Περιγραφή'],
-                'Τιμή ανά συσκευασία': mat['Τιμή ανά συσκευασία'],
-            }
-            for month in available_months:
-                mat_entry[str(month)] = usage.get(month, 0)
-            detailed_materials.append(mat_entry)
-
-        # Απάντηση
-        response_data = {
-            'Ονομα 1': name,
-            'Πληρωτής': client_df['Πληρωτής'].iloc[0] if 'Πληρωτής' in client_df.columns else '-',
-            'Μεταχ': metax,
-            'Τρέχον Υπόλοιπο': balance,
-            'Ημέρες Πίστωσης': credit_days,
-            'Ημέρες Βάση Συμφωνίας': agreement_days,
-            'Εισπρακτέο Ποσό': collectible_amount,
-            'Μήνες': available_months,
-            'Μηνιαίος Τζίρος': monthly_turnover,
-            'Υλικά': detailed_materials
-        }
-
-        return jsonify(clean_for_json(response_data))
+@app.route('/rankings')
+def get_rankings():
+    """Κατάταξη πελατών κατά εισπρακτέο ποσό, ημέρες υπέρβασης της συμφωνίας ή υπόλοιπο, ανά σελίδα"""
+    try:
+        snapshot = data_loader.get_snapshot()
+        if snapshot.df.empty:
+            return jsonify({'error': 'Δεν είναι διαθέσιμα δεδομένα. Ελέγξτε τη σύνδεση με το Google Drive.'}), 500
+        
+        metric = request.args.get('by', 'collectible')
+        if metric not in ClientRankings.METRICS:
+            return jsonify({'error': f"Invalid ranking (use {', '.join(ClientRankings.METRICS)})"}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        total, records = snapshot.rankings().page(metric, offset, limit)
+        return json_response({'by': metric, 'total': total, 'offset': offset, 'limit': limit, 'clients': records})
         
     except Exception as e:
-        logging.error(f"Error getting client data: {e}")
+        logging.error(f"Error getting rankings: {e}")
         return jsonify({'error': f'Σφάλμα επεξεργασίας δεδομένων: {str(e)}'}), 500
 
 @app.route('/refresh-data')
 def refresh_data():
-    """Manual refresh των δεδομένων"""
+    """Manual refresh των δεδομένων στο παρασκήνιο - επιστρέφει αμέσως την κατάσταση"""
     try:
-        df = data_loader.get_dataframe(force_refresh=True)
+        started = data_loader.start_background_refresh(force=True)
+        job = dict(data_loader.refresh_job)
+        if started:
+            job['status'] = 'running'
         return jsonify({
-            'status': 'success', 
-            'message': f'Δεδομένα ανανεώθηκαν επιτυχώς. Φορτώθηκαν {len(df)} γραμμές.',
-            'rows': len(df),
+            'status': 'started' if started else 'already_running',
+            'message': 'Η ανανέωση δεδομένων ξεκίνησε.' if started else 'Η ανανέωση δεδομένων βρίσκεται ήδη σε εξέλιξη.',
+            'job': job,
+            'rows': len(data_loader.df) if data_loader.df is not None else 0,
             'file_id': data_loader.file_id
-        })
+        }), 202
     except Exception as e:
         logging.error(f"Error refreshing data: {e}")
         return jsonify({'error': f'Αποτυχία ανανέωσης δεδομένων: {str(e)}'}), 500
 
+@app.route('/refresh-status')
+def refresh_status():
+    """Κατάσταση της τελευταίας ανανέωσης δεδομένων"""
+    return jsonify({
+        'job': dict(data_loader.refresh_job),
+        'last_loaded': data_loader.last_loaded,
+        'rows': len(data_loader.df) if data_loader.df is not None else 0
+    })
+
 @app.route('/health')
 def health_check():
     """Health check για το Render"""
@@ -959,6 +2921,11 @@ def health_check():
             'has_api_key': bool(data_loader.api_key)
         }), 500
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Μετρικές απόδοσης σε Prometheus text format"""
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/debug')
 def debug_info():
     """Debug endpoint για troubleshooting"""
@@ -974,11 +2941,171 @@ def debug_info():
                 'has_data': data_loader.df is not None,
                 'data_rows': len(data_loader.df) if data_loader.df is not None else 0,
                 'last_loaded': data_loader.last_loaded
+            },
+            'download_methods': [name for name, _ in data_loader._download_methods()],
+            'download_stats': data_loader.download_stats,
+            'single_flight': {
+                'refresh': data_loader.refresh_flight.stats,
+                'report': data_loader.report_flight.stats
             }
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+class AsyncApp:
+    """
+    ASGI εφαρμογή με τα ίδια routes της Flask εφαρμογής (π.χ. uvicorn app:asgi_app).
+    Η φόρτωση από το Drive γίνεται στο event loop και κάθε αίτημα εκτελείται σε
+    περιορισμένο pool threads, οπότε ένα process εξυπηρετεί πολλά ταυτόχρονα αιτήματα
+    χωρίς να κρατά thread όσο περιμένει το Drive.
+    """
+    
+    def __init__(self, wsgi_app, loader, workers=None):
+        # wsgi_app: η Flask εφαρμογή (ή οποιαδήποτε WSGI εφαρμογή που την τυλίγει)
+        self.wsgi_app = wsgi_app
+        self.loader = loader
+        self.workers = workers or int(os.getenv('ASYNC_WORKERS', str(min(8, (os.cpu_count() or 1) + 2))))
+        self.pool = None
+        self._loading = None  # Future της πρώτης φόρτωσης (κοινή για όλα τα αιτήματα)
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        self._bind()
+        
+        # Η πρώτη φόρτωση αναμένεται στο event loop· μετά, stale-while-revalidate όπως πριν
+        loader = self.loader
+        if loader.last_loaded is None:
+            await self.ensure_loaded()
+        elif (time.time() - loader.last_loaded) > loader.cache_duration:
+            loader.start_background_refresh()
+        
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        
+        loop = asyncio.get_running_loop()
+        status, headers, chunks = await loop.run_in_executor(self.pool, self._start_wsgi, scope, bytes(body))
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            # Απαντήσεις σε ροή (/export, /clients/batch): κάθε κομμάτι υπολογίζεται στο pool
+            while True:
+                chunk = await loop.run_in_executor(self.pool, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(chunks, 'close'):
+                await loop.run_in_executor(self.pool, chunks.close)
+    
+    def _bind(self):
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='minicrm-worker')
+        self.loader.async_loop = asyncio.get_running_loop()
+        self.loader.async_pool = self.pool
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._bind()
+                asyncio.ensure_future(self.ensure_loaded())  # Τα δεδομένα φορτώνουν πριν το πρώτο αίτημα
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.loader.async_loop = None
+                if self.pool is not None:
+                    self.pool.shutdown(wait=False)
+                    self.pool = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def ensure_loaded(self):
+        """Πρώτη φόρτωση (τοπικό snapshot ή Drive) μία φορά, όσα αιτήματα κι αν την περιμένουν"""
+        loading = self._loading
+        if loading is None:
+            loading = self._loading = asyncio.ensure_future(self._initial_load())
+        try:
+            await asyncio.shield(loading)
+        finally:
+            # Μετά από αποτυχία το επόμενο αίτημα ξαναδοκιμάζει
+            if loading.done() and self._loading is loading:
+                self._loading = None
+    
+    async def _initial_load(self):
+        loop = asyncio.get_running_loop()
+        loader = self.loader
+        await loop.run_in_executor(self.pool, loader.ensure_disk_snapshot)
+        if loader.last_loaded is not None:
+            return
+        if loader._refresh_lock.acquire(blocking=False):
+            await loader.async_refresh_locked()
+        else:
+            # Φορτώνει ήδη άλλο thread: το περιμένουμε εκτός event loop
+            await loop.run_in_executor(None, loader.get_snapshot)
+    
+    def _start_wsgi(self, scope, body):
+        """Εκτελεί το αίτημα στη Flask εφαρμογή· επιστρέφει (status, headers, iterator σώματος)"""
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+            'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+            value = value.decode('latin-1')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        environ.setdefault('CONTENT_LENGTH', str(len(body)))  # Το σώμα έχει ήδη διαβαστεί ολόκληρο (και chunked)
+        
+        started = {}
+        
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        
+        result = self.wsgi_app(environ, start_response)
+        chunks = iter(result)
+        if hasattr(result, 'close') and not hasattr(chunks, 'close'):
+            chunks = _ClosingIterator(chunks, result.close)
+        return started['status'], started['headers'], chunks
+
+class _ClosingIterator:
+    """Iterator σώματος WSGI που κλείνει και το αρχικό αποτέλεσμα (PEP 3333)"""
+    
+    def __init__(self, iterator, close):
+        self._iterator = iterator
+        self.close = close
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return next(self._iterator)
+
+# Async mode (pip install -r requirements-async.txt):
+# uvicorn app:asgi_app (ή gunicorn -k uvicorn.workers.UvicornWorker app:asgi_app)
+asgi_app = AsyncApp(app, data_loader)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,12 @@
+"""Benchmarks απόδοσης για το app.py"""
+import time
+
+
+def best_of(repeat, fn):
+    """Ο καλύτερος χρόνος (s) από repeat εκτελέσεις"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
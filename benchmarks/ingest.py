@@ -0,0 +1,48 @@
+"""
+Benchmark ανάγνωσης Excel: η παλιά διαδρομή (pd.read_excel όλων των στηλών)
+έναντι του read_workbook με κάθε διαθέσιμο engine.
+
+Χρήση: python -m benchmarks.ingest --rows 50000 --repeat 3
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+
+import pandas as pd
+
+from app import EXCEL_ENGINES, GoogleDriveDataLoader, read_workbook
+from benchmarks import best_of
+from benchmarks.synthetic import make_workbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    loader = GoogleDriveDataLoader()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.xlsx')
+        make_workbook(path, args.rows)
+
+        results = {
+            'rows': args.rows,
+            'file_bytes': os.path.getsize(path),
+            'read_excel': best_of(args.repeat, lambda: loader._clean_dataframe(pd.read_excel(path)))
+        }
+        for engine in EXCEL_ENGINES:
+            try:
+                results[engine] = best_of(args.repeat, lambda: loader._clean_dataframe(read_workbook(path, engine)))
+            except ImportError:
+                results[engine] = None
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
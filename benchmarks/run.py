@@ -0,0 +1,135 @@
+"""
+Benchmark κλιμάκωσης του app.py σε συνθετικά φύλλα (10k/100k/1M γραμμές):
+ανάγνωση + _clean_dataframe, /client μέσω του Flask test client,
+calculate_credit_days, encode_json και clean_for_json. Τα αποτελέσματα γράφονται σε JSON
+ώστε να συγκρίνονται εκτελέσεις πριν/μετά από μια αλλαγή.
+
+Χρήση: python -m benchmarks.run --rows 10000 100000 --output results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import app as application
+from benchmarks import best_of
+from benchmarks.synthetic import SIZES, make_workbook
+
+
+def latency_stats(timings):
+    """Σύνοψη χρόνων ανά κλήση σε ms"""
+    ms = np.array(timings) * 1000
+    return {
+        'calls': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+
+
+def time_each(items, fn):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return latency_stats(timings)
+
+
+def workbook_path(workdir, rows, seed):
+    """Τα μεγάλα .xlsx αργούν να γραφτούν, οπότε ξαναχρησιμοποιούνται στο workdir"""
+    path = os.path.join(workdir, f'synthetic-{rows}-{seed}.xlsx')
+    if not os.path.exists(path):
+        make_workbook(path, rows, seed=seed)
+    return path
+
+
+def run_size(path, rows, clients, repeat, seed):
+    loader = application.data_loader
+    result = {'rows': rows, 'file_bytes': os.path.getsize(path)}
+
+    result['read_excel_clean_s'] = best_of(repeat, lambda: loader._clean_dataframe(pd.read_excel(path)))
+    result['read_workbook_clean_s'] = best_of(repeat, lambda: loader._clean_dataframe(application.read_workbook(path)))
+
+    # Τα ίδια δεδομένα σερβίρονται στην εφαρμογή χωρίς λήψη από το Drive
+    df = loader._clean_dataframe(application.read_workbook(path))
+    start = time.perf_counter()
+    snapshot = application.DataSnapshot(df, time.time())
+    result['snapshot_build_s'] = time.perf_counter() - start
+    result['memory_bytes'] = int(df.memory_usage(deep=True).sum())
+    loader.snapshot = snapshot
+    loader.last_loaded = time.time()
+    loader.report_cache.clear()
+
+    rng = np.random.default_rng(seed)
+    all_names = list(snapshot.client_index)
+    names = [all_names[i] for i in rng.choice(len(all_names), min(clients, len(all_names)), replace=False)]
+    client = application.app.test_client()
+
+    def get_client(name):
+        response = client.get('/client', query_string={'name': name})
+        assert response.status_code == 200, response.status_code
+
+    result['client_uncached'] = time_each(names, get_client)
+    result['client_cached'] = time_each(names, get_client)
+
+    def credit_days(name):
+        client_df = snapshot.get_client_rows(name)
+        balance = client_df['Τρέχον Υπόλοιπο'].dropna()
+        application.calculate_credit_days(client_df, balance.iloc[0] if not balance.empty else '-')
+
+    result['calculate_credit_days'] = time_each(names, credit_days)
+
+    reports = [
+        application.build_client_report(name, snapshot.get_client_rows(name), snapshot.available_months)
+        for name in names
+    ]
+    # Η /client κωδικοποιεί την αναφορά απευθείας με encode_json· το clean_for_json μένει για σύγκριση
+    result['encode_json'] = time_each(reports, application.encode_json)
+    result['clean_for_json'] = time_each(reports, application.clean_for_json)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--clients', type=int, default=50, help='πελάτες ανά μέτρηση /client')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='φάκελος για τα συνθετικά .xlsx (επαναχρησιμοποιούνται)')
+    parser.add_argument('--output', help='αρχείο JSON (αλλιώς stdout)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'minicrm-bench')
+    os.makedirs(workdir, exist_ok=True)
+
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'excel_engine': application.default_excel_engine(),
+        'sizes': []
+    }
+    for rows in args.rows:
+        path = workbook_path(workdir, rows, args.seed)
+        results['sizes'].append(run_size(path, rows, args.clients, args.repeat, args.seed))
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
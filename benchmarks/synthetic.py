@@ -0,0 +1,80 @@
+"""
+Συνθετικά δεδομένα με το σχήμα του πραγματικού φύλλου Excel.
+
+Κάθε πελάτης έχει σταθερό υπόλοιπο, ημέρες συμφωνίας, πληρωτή και Μεταχ
+(όπως στο πραγματικό αρχείο) και γραμμές ανά υλικό και μήνα για τους
+τελευταίους 24 μήνες. Η στήλη Μήνας χρησιμοποιεί όλα τα formats που
+δέχεται η εφαρμογή: (MM), MM_YYYY, MM/YYYY, MM-YYYY.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def make_dataframe(rows, clients=None, extra_columns=0, seed=0, today=None):
+    """DataFrame με τις στήλες της εφαρμογής (ακατέργαστο, όπως διαβάζεται από το Excel)"""
+    rng = np.random.default_rng(seed)
+    today = today or datetime.now()
+    clients = clients or max(rows // 50, 1)
+
+    names = np.array([f"ΠΕΛΑΤΗΣ {i} Α.Ε." for i in range(clients)], dtype=object)
+    payers = np.array([f"ΠΛΗΡΩΤΗΣ {i}" for i in range(max(clients // 3, 1))], dtype=object)
+    materials = np.array([f"ΥΛ{i:04d}" for i in range(500)], dtype=object)
+    descriptions = np.array([f"Περιγραφή υλικού {i}" for i in range(500)], dtype=object)
+
+    # Σταθερά στοιχεία ανά πελάτη· λίγοι χωρίς υπόλοιπο
+    balance = rng.normal(3000, 4000, clients)
+    balance_text = np.array([f"{v:.2f}".replace('.', ',') for v in balance], dtype=object)
+    balance_text[rng.random(clients) < 0.05] = None
+    agreement_days = rng.choice([30, 60, 90, 120], clients)
+    payer = rng.choice(payers, clients)
+    metax = rng.uniform(0, 10, clients).round(2)
+
+    # Γραμμές: πελάτης, υλικό και μήνας μέσα στους τελευταίους 24 μήνες
+    client = rng.integers(0, clients, rows)
+    material = rng.integers(0, len(materials), rows)
+    period = today.year * 12 + today.month - 1 - rng.integers(0, 24, rows)
+    years, months = period // 12, period % 12 + 1
+    formats = rng.integers(0, 4, rows)
+    labels = np.select(
+        [formats == 0, formats == 1, formats == 2],
+        [
+            [f"({m:02d})" for m in months],
+            [f"{m:02d}_{y}" for m, y in zip(months, years)],
+            [f"{m}/{y}" for m, y in zip(months, years)],
+        ],
+        [f"{m:02d}-{y}" for m, y in zip(months, years)],
+    ).astype(object)
+
+    amount = rng.normal(300, 400, rows).round(2)
+    amount[rng.random(rows) < 0.02] = np.nan
+    price = rng.uniform(1, 50, rows).round(2)
+    price[rng.random(rows) < 0.1] = np.nan
+
+    df = pd.DataFrame({
+        'Ονομα 1': names[client],
+        'Πληρωτής': payer[client],
+        'Μήνας': labels,
+        'Ετος': years,
+        'Μικτό ποσό': amount,
+        'Υλικό': materials[material],
+        'Περιγραφή Υλικού': descriptions[material],
+        'Τιμολ.ποσ.': rng.integers(0, 20, rows),
+        'τιμή ανα συσκευασία': price,
+        'Τρέχον Υπόλοιπο': balance_text[client],
+        'ημερες βαση συμφωνιας': agreement_days[client],
+        'Μεταχ': metax[client]
+    })
+    for i in range(extra_columns):
+        df[f'Επιπλέον {i}'] = rng.integers(0, 1000, rows)
+    return df
+
+
+def make_workbook(path, rows, extra_columns=10, seed=0, **kwargs):
+    """Γράφει συνθετικό .xlsx (με επιπλέον αχρείαστες στήλες, όπως το πραγματικό)"""
+    df = make_dataframe(rows, extra_columns=extra_columns, seed=seed, **kwargs)
+    df.to_excel(path, index=False)
+    return df